@@ -1,9 +1,14 @@
+import itertools
 import os
-from sqlalchemy import create_engine
+import time
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
+from .slow_queries import get_slow_query_recorder
+
 # Load environment variables
 # Use the correct .env file path from the backend directory
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), '.env')
@@ -18,18 +23,147 @@ if DATABASE_URL.startswith('sqlite:///./'):
     db_path = os.path.join(backend_dir, 'bhis.db')
     DATABASE_URL = f"sqlite:///{db_path}"
 
-# Create SQLAlchemy engine with correct parameters based on DB type
-if DATABASE_URL.startswith('sqlite'):
-    engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False}
+# Connection pool settings (file-backed SQLite and server databases)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite tuning applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Tune a new SQLite connection: WAL so readers never wait on writers, a busy timeout
+    instead of immediate 'database is locked' errors, larger page cache and mmap, and
+    foreign keys so the ondelete="CASCADE" clauses fire"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    # Negative cache_size is in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def _is_memory_sqlite(url):
+    """In-memory SQLite databases live in a single connection and cannot be pooled"""
+    return url.split("?")[0].split("://", 1)[1] in ("", "/", "/:memory:")
+
+def engine_options(url):
+    """Engine keyword arguments for a database URL, including the pool configuration"""
+    options = {}
+    if url.startswith('sqlite'):
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            return options
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=not url.startswith('sqlite'),
     )
-else:
-    engine = create_engine(DATABASE_URL)
+    return options
+
+def create_db_engine(url, **overrides):
+    """Create a SQLAlchemy engine with the pool configuration, the slow query recorder and,
+    for SQLite, the tuned pragmas"""
+    engine = create_engine(url, **{**engine_options(url), **overrides})
+    if url.startswith('sqlite'):
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    get_slow_query_recorder().install(engine)
+    return engine
+
+# Create SQLAlchemy engine with correct parameters based on DB type
+engine = create_db_engine(DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read replicas (comma-separated URLs) serving the read-only routes; without any, reads
+# use the primary engine above
+READ_DATABASE_URLS = [url.strip() for url in os.getenv("READ_DATABASE_URLS", "").split(",") if url.strip()]
+
+# A caller who committed a write within this many seconds reads from the primary, so
+# replica lag never hides their own writes; it should exceed the usual replica lag
+REPLICA_READ_DELAY_SECONDS = float(os.getenv("REPLICA_READ_DELAY_SECONDS", "5"))
+
+# Cookie carrying the time of the caller's last write
+LAST_WRITE_COOKIE = "bhis_last_write"
+
+read_engines = [create_db_engine(url) for url in READ_DATABASE_URLS]
+
+# Replica session factories, used in turn
+ReadSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=read_engine) for read_engine in read_engines
+]
+_read_sessionmakers = itertools.cycle(ReadSessionLocals) if ReadSessionLocals else None
+
+# Async drivers used for the non-blocking request path
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def _async_database_url(url):
+    """Swap the driver of a database URL for its asyncio equivalent"""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+")[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}://{rest}"
+
+# Serve the hot read/write routes through AsyncSession instead of the synchronous Session
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+
+# The async engines are created on first use so the async drivers stay optional
+async_engine = None
+AsyncSessionLocal = None
+async_read_engines = []
+_async_read_sessionmakers = None
+
+def async_engine_options(url):
+    """Engine keyword arguments for an async database URL
+    
+    aiosqlite defaults to a NullPool, which takes no pool settings; file-backed SQLite is
+    given the asyncio queue pool instead, so it is pooled (and warmed up) like the sync engine.
+    """
+    options = engine_options(url)
+    if url.startswith('sqlite') and "pool_size" in options:
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return options
+
+def create_async_db_engine(url):
+    """Create an async engine with the pool configuration, the slow query recorder and,
+    for SQLite, the tuned pragmas"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    async_db_engine = create_async_engine(url, **async_engine_options(url))
+    if url.startswith('sqlite'):
+        event.listen(async_db_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    get_slow_query_recorder().install(async_db_engine.sync_engine)
+    return async_db_engine
+
+def get_async_sessionmaker():
+    """Create the async engines (primary and replicas) and session factories on first use"""
+    global async_engine, AsyncSessionLocal, async_read_engines, _async_read_sessionmakers
+    if AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
+        async_read_engines = [create_async_db_engine(_async_database_url(url)) for url in READ_DATABASE_URLS]
+        if async_read_engines:
+            _async_read_sessionmakers = itertools.cycle([
+                async_sessionmaker(read_engine, autoflush=False, expire_on_commit=False)
+                for read_engine in async_read_engines
+            ])
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
 # Create base class for models
 Base = declarative_base()
 
@@ -39,4 +173,112 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def _wrote_recently(request: Request) -> bool:
+    """Whether the caller's last-write cookie is within the replica read delay"""
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - last_write < REPLICA_READ_DELAY_SECONDS
+
+# Dependency to get a session factory for read-only work that outlives the route handler
+def get_read_sessionmaker(request: Request):
+    """Factory of sessions on a read replica, or on the primary when no replica is configured
+    or the caller has just written (read-your-writes)
+    
+    Streamed responses open their session from it inside the stream: dependencies with
+    yield are torn down before the response body is sent.
+    """
+    if _read_sessionmakers is None or _wrote_recently(request):
+        return SessionLocal
+    return next(_read_sessionmakers)
+
+# Dependency to get a DB session for read-only routes
+def get_read_db(request: Request):
+    """Session on a read replica, or on the primary when no replica is configured or the
+    caller has just written (read-your-writes)"""
+    db = get_read_sessionmaker(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def mark_write(response: Response):
+    """Set the caller's last-write cookie, so their next reads go to the primary"""
+    if read_engines:
+        response.set_cookie(LAST_WRITE_COOKIE, f"{time.time():.3f}", max_age=int(REPLICA_READ_DELAY_SECONDS) + 1,
+                            httponly=True, samesite="lax")
+
+# Dependency to get a DB session for routes that write
+def get_write_db(response: Response):
+    """Session on the primary; a commit sets the caller's last-write cookie so their next
+    reads also go to the primary"""
+    db = SessionLocal()
+    if read_engines:
+        event.listen(db, "after_commit", lambda session: mark_write(response))
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+# Dependency to get an async DB session for read-only routes, as get_read_db
+async def get_async_read_db(request: Request):
+    """AsyncSession on a read replica, or on the primary when no replica is configured or
+    the caller has just written (read-your-writes)"""
+    sessions = get_async_sessionmaker()
+    if _async_read_sessionmakers is not None and not _wrote_recently(request):
+        sessions = next(_async_read_sessionmakers)
+    async with sessions() as db:
+        yield db
+
+# Dependency to get an async DB session for routes that write, as get_write_db
+async def get_async_write_db(response: Response):
+    """AsyncSession on the primary; a commit sets the caller's last-write cookie so their
+    next reads also go to the primary"""
+    async with get_async_sessionmaker()() as db:
+        if read_engines:
+            event.listen(db.sync_session, "after_commit", lambda session: mark_write(response))
+        yield db
+
+def warm_up_pool(engine, connections: int = DB_POOL_SIZE):
+    """Open pooled connections before the first request, so requests do not pay for
+    connecting (and, for SQLite, for the connection pragmas)"""
+    held = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            held.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in held:
+            connection.close()
+
+async def warm_up_async_pool(connections: int = DB_POOL_SIZE):
+    """Create the async engine and open its pooled connections before the first request"""
+    get_async_sessionmaker()
+    held = []
+    try:
+        for _ in range(connections):
+            connection = await async_engine.connect()
+            held.append(connection)
+            await connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in held:
+            await connection.close()
+
+async def dispose_engines():
+    """Close every pooled connection (application shutdown)"""
+    engine.dispose()
+    for read_engine in read_engines:
+        read_engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    for async_read_engine in async_read_engines:
+        await async_read_engine.dispose()
@@ -0,0 +1,119 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from .database import Base
+from ..models.models import Client, Program, Enrollment, EnrollmentStat
+from ..services.search import ClientSearchIndex
+from ..services.services import EnrollmentStatsService
+
+logger = logging.getLogger(__name__)
+
+# Applied schema migrations, one row per version. Kept out of Base.metadata so the
+# application models never depend on it.
+migration_metadata = MetaData()
+schema_version = Table(
+    "schema_version", migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+# Ordered list of (version, description, function(connection)). Migrations must be
+# idempotent: on a fresh database create_all has already built the current schema.
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    """Register a schema migration; versions must be added in increasing order"""
+    def register(func):
+        if MIGRATIONS and MIGRATIONS[-1][0] >= version:
+            raise ValueError(f"Migration {version} is out of order")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+def _create_indexes(connection, *indexes):
+    for index in indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _index(table, name):
+    return next(index for index in table.indexes if index.name == name)
+
+
+@migration(1, "Change feed indexes on (updated_at, id) and (created_at, id)")
+def _change_feed_indexes(connection):
+    _create_indexes(
+        connection,
+        _index(Client.__table__, "ix_clients_updated_at_id"),
+        _index(Program.__table__, "ix_programs_updated_at_id"),
+        _index(Enrollment.__table__, "ix_enrollments_created_at_id"),
+    )
+
+
+@migration(2, "Client search index")
+def _client_search_index(connection):
+    ClientSearchIndex.ensure(connection)
+
+
+@migration(3, "Indexes for enrollments by program and clients by name")
+def _secondary_indexes(connection):
+    _create_indexes(
+        connection,
+        _index(Enrollment.__table__, "ix_enrollments_program_id_client_id"),
+        _index(Client.__table__, "ix_clients_name"),
+    )
+
+
+@migration(4, "Add clients.gender to databases created before it existed")
+def _client_gender(connection):
+    if "gender" not in {column["name"] for column in inspect(connection).get_columns("clients")}:
+        column = Client.__table__.c.gender
+        connection.exec_driver_sql(
+            f"ALTER TABLE clients ADD COLUMN gender {column.type.compile(dialect=connection.dialect)}"
+        )
+
+
+@migration(5, "Backfill pre-aggregated enrollment statistics")
+def _enrollment_stats(connection):
+    connection.execute(delete(EnrollmentStat))
+    enrollments = connection.execute(
+        select(Enrollment.program_id, Client.gender, Client.date_of_birth, Enrollment.enrollment_date)
+        .join(Client, Enrollment.client_id == Client.id)
+    )
+    with Session(bind=connection) as session:
+        EnrollmentStatsService.record(session, enrollments)
+
+
+@migration(6, "Client substring search index")
+def _client_substring_search_index(connection):
+    ClientSearchIndex.ensure(connection)
+
+
+def get_schema_version(connection):
+    """Get the highest applied migration version (0 for an unversioned database)"""
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def run_migrations(engine):
+    """Create missing tables, then apply pending migrations in order, each in its own transaction"""
+    Base.metadata.create_all(bind=engine)
+    migration_metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        current = get_schema_version(connection)
+
+    for version, description, func in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying schema migration {version}: {description}")
+        with engine.begin() as connection:
+            func(connection)
+            connection.execute(insert(schema_version).values(version=version, description=description))
+
+    with engine.connect() as connection:
+        return get_schema_version(connection)
@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event
+
+from ..services.metrics import current_route
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are recorded; a negative value disables the recorder
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Number of slow statements kept (oldest are dropped first)
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+# Bound parameters may hold client details; they can be left out of the log
+SLOW_QUERY_LOG_PARAMETERS = os.getenv("SLOW_QUERY_LOG_PARAMETERS", "true").lower() in ("1", "true", "yes")
+# Capture the query plan of slow SELECT statements
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+
+# Longest parameter listing kept per entry
+MAX_PARAMETERS_LENGTH = 1000
+
+# Plan statement per dialect; EXPLAIN without ANALYZE only plans, it does not re-run the query
+_EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+
+class SlowQueryRecorder:
+    """Records statements slower than a threshold, with their parameters, the route
+    that issued them and their query plan, in a size-bounded ring buffer"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, size: int = SLOW_QUERY_LOG_SIZE,
+                 log_parameters: bool = SLOW_QUERY_LOG_PARAMETERS, explain: bool = SLOW_QUERY_EXPLAIN):
+        self.threshold_ms = threshold_ms
+        self.log_parameters = log_parameters
+        self.explain = explain
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def install(self, engine):
+        """Time every statement executed through the engine (unless the recorder is disabled)"""
+        if self.threshold_ms < 0:
+            return
+        if not event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # The start time is kept on the statement's execution context: after_cursor_execute
+    # does not fire for statements that fail
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context._slow_query_start) * 1000
+        if self.threshold_ms < 0 or elapsed_ms < self.threshold_ms:
+            return
+
+        plan = None
+        if self.explain and not executemany:
+            plan = self._explain(conn, statement, parameters)
+        entry = {
+            "recorded_at": datetime.utcnow().isoformat(),
+            "duration_ms": round(elapsed_ms, 2),
+            "route": current_route(),
+            "statement": statement,
+            "parameters": self._format_parameters(parameters) if self.log_parameters else None,
+            "executemany": executemany,
+            "plan": plan,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms) from {entry['route'] or 'background'}: {statement}")
+
+    @staticmethod
+    def _format_parameters(parameters):
+        text = repr(parameters)
+        return text if len(text) <= MAX_PARAMETERS_LENGTH else text[:MAX_PARAMETERS_LENGTH] + "..."
+
+    @staticmethod
+    def _explain(conn, statement, parameters):
+        """Plan a read statement on a fresh DBAPI cursor, bypassing the engine events"""
+        prefix = _EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        finally:
+            cursor.close()
+        # SQLite rows are (id, parent, notused, detail); PostgreSQL rows hold one plan line
+        return [row[-1] for row in rows]
+
+    def entries(self, limit: int = None):
+        """Get recorded slow statements, newest first"""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold_ms,
+                "size": len(self._entries),
+                "maxsize": self._entries.maxlen,
+                "recorded": self.recorded,
+            }
+
+
+_recorder = SlowQueryRecorder()
+
+
+def get_slow_query_recorder() -> SlowQueryRecorder:
+    """Get the process-wide slow query recorder"""
+    return _recorder
@@ -1,18 +1,49 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database.database import engine, Base
-from .routes.routes import program_router, client_router, enrollment_router, api_router
+from .database.database import engine, read_engines, SessionLocal, ASYNC_DB_ENABLED, warm_up_pool, warm_up_async_pool, dispose_engines
+from .routes.routes import program_router, client_router, enrollment_router, api_router, admin_router
+from .database.migrations import run_migrations
+from .middleware.compression import CompressionMiddleware
+from .middleware.timing import TimingMiddleware
+from .services.metrics import METRICS_ENABLED, install_sql_instrumentation
+from .services.catalog import get_program_catalog
+
+# Schema setup on startup; the multi-worker launcher (serve.py) runs it once before
+# starting the workers and turns it off for them
+SCHEMA_SETUP = os.getenv("SCHEMA_SETUP", "true").lower() in ("1", "true", "yes")
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the process before it accepts requests, and release its connections once
+    the server has drained the in-flight requests on shutdown"""
+    if SCHEMA_SETUP:
+        # Create database tables and bring existing databases up to the current schema version
+        run_migrations(engine)
+    
+    # Load the program catalog used for enrollment checks and profile assembly
+    with SessionLocal() as db:
+        get_program_catalog().load(db)
+    warm_up_pool(engine)
+    for read_engine in read_engines:
+        warm_up_pool(read_engine)
+    if ASYNC_DB_ENABLED:
+        await warm_up_async_pool()
+    
+    yield
+    
+    await dispose_engines()
 
 # Create FastAPI app
 app = FastAPI(
     title="Basic Health Information System",
     description="A prototype system for managing health program clients",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -24,11 +55,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated gzip/brotli compression of response bodies above a size threshold
+app.add_middleware(CompressionMiddleware)
+
+# Request timing and SQL statement metrics (outermost, so it covers the whole stack)
+if METRICS_ENABLED:
+    install_sql_instrumentation()
+    app.add_middleware(TimingMiddleware)
+
+# Include non-blocking AsyncSession routes first so they take precedence
+if ASYNC_DB_ENABLED:
+    from .routes.async_routes import async_program_router, async_client_router, async_enrollment_router, async_api_router
+    app.include_router(async_program_router)
+    app.include_router(async_client_router)
+    app.include_router(async_enrollment_router)
+    app.include_router(async_api_router)
+
 # Include routers
 app.include_router(program_router)
 app.include_router(client_router)
 app.include_router(enrollment_router)
 app.include_router(api_router)
+app.include_router(admin_router)
 
 # Custom exception handler
 @app.exception_handler(Exception)
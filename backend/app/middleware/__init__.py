@@ -0,0 +1 @@
+# Middleware module initialization
\ No newline at end of file
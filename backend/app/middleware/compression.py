@@ -0,0 +1,140 @@
+import os
+import zlib
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+
+# Responses smaller than this are sent uncompressed (the encoding overhead outweighs the savings)
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1000"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Brotli's higher qualities are meant for static assets; 4 compresses better than gzip at a similar cost
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Supported content codings in server preference order (used to break q-value ties)
+ENCODINGS = ["br", "gzip"]
+
+# Statuses that never carry a body
+_NO_BODY_STATUSES = (204, 304)
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick the content coding for an Accept-Encoding header, or None to send the body as is"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[coding] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    """Incremental gzip or brotli encoder"""
+    __slots__ = ("_compress", "_finish")
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self._compress, self._finish = compressor.process, compressor.finish
+        else:
+            # wbits 16 + MAX_WBITS selects the gzip container
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress, self._finish = compressor.compress, compressor.flush
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        data = self._compress(data)
+        return data + self._finish() if final else data
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware that compresses response bodies with gzip or brotli, as
+    negotiated through Accept-Encoding
+
+    Bodies below the size threshold are sent unchanged. Streamed responses (e.g. the
+    client export) are compressed chunk by chunk without being buffered. The API's own
+    ETags are already weak (see representation_etag), so 304s pass through unchanged;
+    any other strong ETag is weakened on an encoded response, since its bytes differ
+    from the identity representation while the content does not.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+                 gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compression is worth it
+                start_message = message
+                if message["status"] in _NO_BODY_STATUSES or message["status"] < 200:
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(scope=start_message)
+                if "content-encoding" in headers or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                body = compressor.compress(body, final=not more_body)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                _weaken_etag(headers)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+            else:
+                body = compressor.compress(body, final=not more_body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _weaken_etag(headers: MutableHeaders):
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
@@ -0,0 +1,46 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+
+from ..services.metrics import MetricsRegistry, get_metrics_registry, start_request, end_request
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware that times each request, counts its SQL statements and
+    reports both in a Server-Timing header and the in-process metrics registry
+
+    Requests are labelled with their route template (e.g. /clients/{client_id}) so
+    the number of series stays bounded; paths that match no route share one label.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = None):
+        self.app = app
+        self.registry = registry or get_metrics_registry()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_request(scope)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Streamed bodies are done here, so this also covers their SQL and serialization
+            elapsed = time.perf_counter() - started
+            end_request(token)
+            route = scope.get("route")
+            self.registry.observe_request(
+                scope["method"], getattr(route, "path", "unmatched"), status, elapsed, stats
+            )
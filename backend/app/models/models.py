@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, UniqueConstraint, func, Enum
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, LargeBinary, ForeignKey, UniqueConstraint, Index, func, Enum
 from sqlalchemy.orm import relationship, joinedload
 from datetime import date, datetime
 import enum
@@ -23,6 +23,13 @@ class Client(Base):
     
     # Relationship with Enrollment
     enrollments = relationship("Enrollment", back_populates="client", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Supports the change feed, which reads clients in (updated_at, id) order
+        Index('ix_clients_updated_at_id', 'updated_at', 'id'),
+        # Exact and ordered lookups by name (free-text search uses the search index)
+        Index('ix_clients_name', 'name'),
+    )
 
 class Program(Base):
     __tablename__ = "programs"
@@ -35,6 +42,11 @@ class Program(Base):
     
     # Relationship with Enrollment
     enrollments = relationship("Enrollment", back_populates="program", cascade="all, delete-orphan")
+    
+    # Supports the change feed, which reads programs in (updated_at, id) order
+    __table_args__ = (
+        Index('ix_programs_updated_at_id', 'updated_at', 'id'),
+    )
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
@@ -52,4 +64,51 @@ class Enrollment(Base):
     # Ensure a client can only be enrolled once per program
     __table_args__ = (
         UniqueConstraint('client_id', 'program_id', name='uq_client_program'),
-    ) 
\ No newline at end of file
+        # Supports the change feed, which reads enrollments in (created_at, id) order
+        Index('ix_enrollments_created_at_id', 'created_at', 'id'),
+        # Enrollments by program; lookups by client use the unique constraint's index
+        Index('ix_enrollments_program_id_client_id', 'program_id', 'client_id'),
+    )
+
+class EnrollmentStat(Base):
+    """Pre-aggregated enrollment counts, maintained incrementally as clients are enrolled"""
+    __tablename__ = "enrollment_stats"
+    
+    program_id = Column(Integer, ForeignKey("programs.id", ondelete="CASCADE"), primary_key=True)
+    # Client gender, or "unknown" when not recorded
+    gender = Column(String, primary_key=True)
+    # Client age band at the enrollment date, e.g. "25-34"
+    age_band = Column(String, primary_key=True)
+    # Enrollment month as YYYY-MM
+    month = Column(String, primary_key=True)
+    enrollment_count = Column(Integer, nullable=False, default=0)
+
+class ApiKey(Base):
+    """Partner API key; only the SHA-256 hash of the key is stored"""
+    __tablename__ = "api_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    partner = Column(String, nullable=False)
+    # First characters of the key, to tell keys apart without storing them
+    key_prefix = Column(String, nullable=False)
+    key_hash = Column(String, nullable=False, unique=True)
+    # Requests per minute; NULL uses the default limit
+    rate_limit = Column(Integer, nullable=True)
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    revoked_at = Column(DateTime, nullable=True)
+
+class IdempotencyKey(Base):
+    """Outcome of a write made with an Idempotency-Key header, replayed to retries of it"""
+    __tablename__ = "idempotency_keys"
+    
+    # SHA-256 of the client's key, so rows stay fixed-size whatever the key length
+    key_hash = Column(String, primary_key=True)
+    # SHA-256 of the route and request body; a retry must send the same request
+    fingerprint = Column(String, nullable=False)
+    # NULL while the original request is still being processed
+    status_code = Column(Integer, nullable=True)
+    # Response body as compact JSON
+    response = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
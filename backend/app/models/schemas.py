@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import date
+from datetime import date, datetime
 from enum import Enum
 
 # Gender enum
@@ -62,6 +62,9 @@ class Enrollment(EnrollmentBase):
     class Config:
         from_attributes = True
 
+class BulkEnrollmentCreate(EnrollmentCreate):
+    client_id: int
+
 # Extended schemas for client with enrollments
 class ProgramEnrollment(BaseModel):
     program_id: int
@@ -77,6 +80,104 @@ class ClientProfile(Client):
     class Config:
         from_attributes = True
 
+class ClientWithEnrollments(Client):
+    enrollments: List[ProgramEnrollment] = []
+
+# Keyset pagination schemas
+class ClientPage(BaseModel):
+    items: List[ClientWithEnrollments]
+    next_cursor: Optional[str] = None
+
+class ProgramPage(BaseModel):
+    items: List[Program]
+    next_cursor: Optional[str] = None
+
+# Program roster schemas
+class ProgramClient(Client):
+    enrollment_date: date
+
+class ProgramClientPage(BaseModel):
+    items: List[ProgramClient]
+    next_cursor: Optional[str] = None
+
+# Enrollment statistics schemas
+class EnrollmentStatsRow(BaseModel):
+    program_id: int
+    program_name: str
+    gender: Optional[str] = None
+    age_band: Optional[str] = None
+    month: Optional[str] = None
+    count: int
+
+class EnrollmentStats(BaseModel):
+    total: int
+    rows: List[EnrollmentStatsRow]
+
+# Cohort report schemas
+class CohortRow(BaseModel):
+    program_id: int
+    program_name: str
+    gender: str
+    age_band: str
+    period: str
+    count: int
+
+class CohortReport(BaseModel):
+    period: str
+    total: int
+    rows: List[CohortRow]
+
+# Bulk operation schemas
+class BulkRowResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkRowResult]
+
+# Batch profile lookup schemas
+class ClientBatchRequest(BaseModel):
+    ids: List[int]
+
+class ClientBatchItem(BaseModel):
+    id: int
+    profile: Optional[ClientProfile] = None
+    error: Optional[str] = None
+
+class ClientBatchResult(BaseModel):
+    found: int
+    missing: int
+    results: List[ClientBatchItem]
+
+# Change feed schemas
+class ClientChange(Client):
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class ProgramChange(Program):
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class EnrollmentChange(BaseModel):
+    id: int
+    client_id: int
+    program_id: int
+    enrollment_date: date
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class ChangeFeed(BaseModel):
+    clients: List[ClientChange]
+    programs: List[ProgramChange]
+    enrollments: List[EnrollmentChange]
+    next_cursor: str
+    has_more: bool
+
 # Error response schema
 class ErrorResponse(BaseModel):
     error: str 
\ No newline at end of file
@@ -0,0 +1,169 @@
+from fastapi import APIRouter, Depends, HTTPException, Security, status, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Awaitable, Callable, List, Optional, Union
+import logging
+
+from ..database.database import get_async_read_db, get_async_write_db
+from ..services.async_services import AsyncProgramService, AsyncClientService, AsyncEnrollmentService
+from ..services.services import rows_etag, representation_etag
+from ..models.schemas import Program, ProgramCreate, Client, ClientCreate, ClientProfile, Enrollment, EnrollmentCreate, ErrorResponse, ClientWithEnrollments, ClientPage, ProgramPage
+from ..services.auth import get_api_key
+from ..services.serialization import json_response
+from ..services.idempotency import IdempotencyService
+from .routes import handle_exceptions, etag_matches, etag_check, not_modified_response, client_fields, page_limit, idempotency_key, replayed_response
+
+logger = logging.getLogger(__name__)
+
+# Non-blocking versions of the high-traffic routes in routes.py, served through an
+# AsyncSession. When ASYNC_DB is enabled main.py registers these routers first, so
+# they take precedence over the synchronous handlers for the same paths. Client IDs
+# use the int path convertor so static paths such as /clients/export fall through.
+
+async_program_router = APIRouter(
+    prefix="/programs",
+    tags=["programs"],
+    responses={404: {"model": ErrorResponse}}
+)
+
+async_client_router = APIRouter(
+    prefix="/clients",
+    tags=["clients"],
+    responses={404: {"model": ErrorResponse}}
+)
+
+async_enrollment_router = APIRouter(
+    prefix="/clients/{client_id}/enrollments",
+    tags=["enrollments"],
+    responses={404: {"model": ErrorResponse}}
+)
+
+async_api_router = APIRouter(
+    prefix="/api",
+    tags=["api"],
+    responses={404: {"model": ErrorResponse}}
+)
+
+# Helper function to get client profile, or a 304 response when the caller's ETag is current
+async def get_conditional_client_profile(client_id: int, db: AsyncSession, request: Request, response: Response,
+                                         fields=None):
+    """Get client profile, or a 304 response when the caller's ETag is current"""
+    version = await AsyncClientService.get_client_etag(db, client_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Client with ID {client_id} not found")
+    etag = representation_etag(version, fields)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    return json_response(await AsyncClientService.get_client_profile(db, client_id, version, fields), response)
+
+# Helper function for idempotent writes, as idempotent_write in routes.py
+async def idempotent_write(db: AsyncSession, key: Optional[str], scope: str, payload, response: Response,
+                           write: Callable[[bool], Awaitable[Any]], status_code: int = status.HTTP_201_CREATED):
+    """Run write(commit) (returning response content) once per Idempotency-Key; retries get the stored response"""
+    if key is None:
+        return await write(True)
+    fingerprint = IdempotencyService.fingerprint(scope, payload)
+    stored = await db.run_sync(IdempotencyService.begin, key, fingerprint)
+    if stored is not None:
+        return replayed_response(stored, response)
+    try:
+        content = await write(False)
+        await db.run_sync(IdempotencyService.complete, key, status_code, content)
+    except Exception:
+        # Releases the key along with the failed write
+        await db.rollback()
+        raise
+    return json_response(content, response, status_code)
+
+# ----- Program Routes -----
+
+@async_program_router.post("/", response_model=Program, status_code=status.HTTP_201_CREATED)
+@handle_exceptions
+async def create_program(program: ProgramCreate, db: AsyncSession = Depends(get_async_write_db)):
+    """Create a new health program"""
+    return await AsyncProgramService.create_program(db, program)
+
+@async_program_router.get("/", response_model=Union[List[Program], ProgramPage])
+@handle_exceptions
+async def get_programs(request: Request, response: Response, skip: int = Query(0, ge=0),
+                limit: int = Depends(page_limit),
+                cursor: Optional[str] = Query(None, description="Keyset pagination cursor; pass an empty value for the first page"),
+                db: AsyncSession = Depends(get_async_read_db)):
+    """Retrieve all health programs"""
+    if cursor is not None:
+        result = await AsyncProgramService.get_programs_page(db, cursor, limit)
+        etag = representation_etag(rows_etag(result["items"]))
+    else:
+        result = await AsyncProgramService.get_programs(db, skip, limit)
+        etag = representation_etag(rows_etag(result))
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    return result
+
+# ----- Client Routes -----
+
+@async_client_router.post("/", response_model=Client, status_code=status.HTTP_201_CREATED)
+@handle_exceptions
+async def create_client(client: ClientCreate, response: Response,
+                key: Optional[str] = Depends(idempotency_key), db: AsyncSession = Depends(get_async_write_db)):
+    """Register a new client"""
+    async def write(commit):
+        return Client.model_validate(await AsyncClientService.create_client(db, client, commit)).model_dump(mode="json")
+    return await idempotent_write(db, key, "POST /clients/", client, response, write)
+
+@async_client_router.get("/", response_model=Union[List[ClientWithEnrollments], ClientPage])
+@handle_exceptions
+async def get_clients(request: Request, response: Response,
+                search: Optional[str] = Query(None, description="Search by name or contact info"),
+                prefix: bool = Query(True, description="Match search terms anywhere in a word; false matches whole words only"),
+                fuzzy: bool = Query(False, description="Also match terms within a small spelling distance"),
+                skip: int = Query(0, ge=0), limit: int = Depends(page_limit),
+                cursor: Optional[str] = Query(None, description="Keyset pagination cursor; pass an empty value for the first page"),
+                fields: Optional[List[str]] = Depends(client_fields),
+                db: AsyncSession = Depends(get_async_read_db)):
+    """Search or list registered clients"""
+    not_modified = etag_check(request, response)
+    if cursor is not None:
+        if search:
+            result = await AsyncClientService.search_clients_page(db, search, cursor, limit, prefix=prefix, fuzzy=fuzzy,
+                                                                  not_modified=not_modified, fields=fields)
+        else:
+            result = await AsyncClientService.get_clients_page(db, cursor, limit, not_modified=not_modified,
+                                                               fields=fields)
+    elif search:
+        result = await AsyncClientService.search_clients(db, search, skip, limit, prefix=prefix, fuzzy=fuzzy,
+                                                         not_modified=not_modified, fields=fields)
+    else:
+        result = await AsyncClientService.get_clients(db, skip, limit, not_modified=not_modified, fields=fields)
+    if result is None:
+        return not_modified_response(response.headers["ETag"])
+    return json_response(result, response)
+
+@async_client_router.get("/{client_id:int}", response_model=ClientProfile)
+async def get_client(client_id: int, request: Request, response: Response,
+                fields: Optional[List[str]] = Depends(client_fields), db: AsyncSession = Depends(get_async_read_db)):
+    """View a specific client's profile (including program enrollments)"""
+    return await get_conditional_client_profile(client_id, db, request, response, fields)
+
+# ----- Enrollment Routes -----
+
+@async_enrollment_router.post("/", response_model=Enrollment, status_code=status.HTTP_201_CREATED)
+@handle_exceptions
+async def enroll_client(client_id: int, enrollment: EnrollmentCreate, response: Response,
+                key: Optional[str] = Depends(idempotency_key), db: AsyncSession = Depends(get_async_write_db)):
+    """Enroll a client in a program"""
+    logger.info(f"Enrollment request received: client_id={client_id}, data={enrollment}")
+    result = await idempotent_write(db, key, f"POST /clients/{client_id}/enrollments/", enrollment, response,
+                                    lambda commit: AsyncEnrollmentService.enroll_client(db, client_id, enrollment, commit))
+    logger.info(f"Enrollment successful: {result}")
+    return result
+
+# ----- API Routes (with authentication) -----
+
+@async_api_router.get("/clients/{client_id:int}", response_model=ClientProfile)
+async def get_client_profile_api(client_id: int, request: Request, response: Response,
+                fields: Optional[List[str]] = Depends(client_fields),
+                db: AsyncSession = Depends(get_async_read_db), api_key: str = Security(get_api_key)):
+    """View a specific client's profile via secure API"""
+    return await get_conditional_client_profile(client_id, db, request, response, fields)
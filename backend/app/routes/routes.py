@@ -1,14 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Security, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Header, Security, status, Query, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional, Callable, Any
+from typing import List, Optional, Callable, Any, Union, Literal
 from functools import wraps
+from datetime import date, datetime
 import traceback
 import logging
 
-from ..database.database import get_db
-from ..services.services import ProgramService, ClientService, EnrollmentService
-from ..models.schemas import Program, ProgramCreate, Client, ClientCreate, ClientProfile, Enrollment, EnrollmentCreate, ErrorResponse, ProgramEnrollment
-from ..services.auth import get_api_key
+from ..database.database import get_read_db, get_read_sessionmaker, get_write_db, mark_write
+from ..services.services import ProgramService, ClientService, EnrollmentService, EnrollmentStatsService, ChangeFeedService, rows_etag, representation_etag, parse_client_fields, STATS_DIMENSIONS
+from ..models.schemas import Program, ProgramCreate, Client, ClientCreate, ClientProfile, Enrollment, EnrollmentCreate, ErrorResponse, ProgramEnrollment, ClientWithEnrollments, ClientPage, ProgramPage, ProgramClientPage, EnrollmentStats, CohortReport, BulkResult, ChangeFeed, ClientBatchRequest, ClientBatchResult
+from ..services.auth import get_api_key, get_admin_key, get_api_key_cache
+from ..services.cache import get_profile_cache
+from ..services.catalog import get_program_catalog
+from ..services.rate_limit import get_rate_limiter
+from ..services.analytics import CohortAnalytics
+from ..services.metrics import get_metrics_registry
+from ..database.slow_queries import get_slow_query_recorder
+from ..services.serialization import json_response
+from ..services.pagination import MAX_PAGE_LIMIT
+from ..services.idempotency import IdempotencyService, IdempotencyKeyConflict, IDEMPOTENCY_KEY_MAX_LENGTH
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -42,6 +53,13 @@ api_router = APIRouter(
     responses={404: {"model": ErrorResponse}}
 )
 
+# Create admin router (operational endpoints, with authentication)
+admin_router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Security(get_admin_key)]
+)
+
 # Helper function for error handling
 def handle_exceptions(func: Callable) -> Callable:
     """Decorator to handle common exceptions in route handlers"""
@@ -55,6 +73,9 @@ def handle_exceptions(func: Callable) -> Callable:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
             else:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except IdempotencyKeyConflict as e:
+            logger.warning(f"Idempotency conflict in {func.__name__}: {str(e)}")
+            raise HTTPException(status_code=e.status_code, detail=str(e))
         except Exception as e:
             logger.error(f"Unexpected error in {func.__name__}: {str(e)}")
             logger.error(traceback.format_exc())
@@ -64,66 +85,295 @@ def handle_exceptions(func: Callable) -> Callable:
             )
     return wrapper
 
+# Helper functions for conditional GET (ETag / If-None-Match)
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches the given ETag
+
+    Uses the weak comparison If-None-Match calls for, so a tag matches with or without W/.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def etag_check(request: Request, response: Response) -> Callable[[str], bool]:
+    """Build a not_modified callback that sets the ETag header and compares it with If-None-Match"""
+    def not_modified(etag: str) -> bool:
+        response.headers["ETag"] = etag
+        return etag_matches(request, etag)
+    return not_modified
+
+def not_modified_response(etag: str) -> Response:
+    """Empty 304 response for a caller whose copy is current"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+def client_fields(fields: Optional[str] = Query(
+        None, description="Sparse fieldset, e.g. id,name; enrollments are only loaded when listed")) -> Optional[List[str]]:
+    """Dependency parsing the fields query parameter of the client list and profile routes"""
+    try:
+        return parse_client_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def page_limit(request: Request, limit: int = Query(
+        100, description=f"Maximum items per page; 1 to {MAX_PAGE_LIMIT} with a cursor")) -> int:
+    """Dependency reading the limit query parameter of the listing routes
+    
+    Keyset pages (with a cursor) are bounded; offset pages accept any limit, as before
+    cursors existed.
+    """
+    if "cursor" in request.query_params and not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {MAX_PAGE_LIMIT} with a cursor")
+    return limit
+
+# Helper functions for idempotent writes (Idempotency-Key header)
+def idempotency_key(key: Optional[str] = Header(
+        None, alias="Idempotency-Key", description="Unique key per logical request; retries with it are not applied twice")) -> Optional[str]:
+    """Dependency reading the Idempotency-Key header of the create routes"""
+    if key is not None and not 0 < len(key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+    return key
+
+def replayed_response(stored, response: Response) -> Response:
+    """Stored response of an earlier request with the same Idempotency-Key"""
+    status_code, body = stored
+    # The caller may not have seen the original response, so it reads its write from the primary too
+    mark_write(response)
+    response.headers["Idempotent-Replayed"] = "true"
+    return Response(body, status_code=status_code, media_type="application/json", headers=dict(response.headers))
+
+def idempotent_write(db: Session, key: Optional[str], scope: str, payload, response: Response,
+                     write: Callable[[bool], Any], status_code: int = status.HTTP_201_CREATED):
+    """Run write(commit) (returning response content) once per Idempotency-Key; retries get the stored response
+    
+    With a key, the write is only flushed: the key, the write and its stored response
+    then commit together, so a write is never applied without its response.
+    """
+    if key is None:
+        return write(True)
+    fingerprint = IdempotencyService.fingerprint(scope, payload)
+    stored = IdempotencyService.begin(db, key, fingerprint)
+    if stored is not None:
+        return replayed_response(stored, response)
+    try:
+        content = write(False)
+        IdempotencyService.complete(db, key, status_code, content)
+    except Exception:
+        # Releases the key along with the failed write
+        db.rollback()
+        raise
+    return json_response(content, response, status_code)
+
 # Helper function to get client profile with validation
-def get_validated_client_profile(client_id: int, db: Session) -> ClientProfile:
+def get_validated_client_profile(client_id: int, db: Session, etag: str = None, fields=None) -> dict:
     """Get client profile and raise HTTPException if not found"""
-    client = ClientService.get_client_profile(db, client_id)
+    client = ClientService.get_client_profile(db, client_id, etag, fields)
     if client is None:
         raise HTTPException(status_code=404, detail=f"Client with ID {client_id} not found")
     return client
 
+def get_conditional_client_profile(client_id: int, db: Session, request: Request, response: Response, fields=None):
+    """Get client profile, or a 304 response when the caller's ETag is current"""
+    version = ClientService.get_client_etag(db, client_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"Client with ID {client_id} not found")
+    etag = representation_etag(version, fields)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    return json_response(get_validated_client_profile(client_id, db, version, fields), response)
+
 # ----- Program Routes -----
 
 @program_router.post("/", response_model=Program, status_code=status.HTTP_201_CREATED)
 @handle_exceptions
-async def create_program(program: ProgramCreate, db: Session = Depends(get_db)):
+async def create_program(program: ProgramCreate, db: Session = Depends(get_write_db)):
     """Create a new health program"""
     return ProgramService.create_program(db, program)
 
-@program_router.get("/", response_model=List[Program])
-async def get_programs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@program_router.get("/", response_model=Union[List[Program], ProgramPage])
+@handle_exceptions
+async def get_programs(request: Request, response: Response, skip: int = Query(0, ge=0),
+                limit: int = Depends(page_limit),
+                cursor: Optional[str] = Query(None, description="Keyset pagination cursor; pass an empty value for the first page"),
+                db: Session = Depends(get_read_db)):
     """Retrieve all health programs"""
-    return ProgramService.get_programs(db, skip, limit)
+    if cursor is not None:
+        result = ProgramService.get_programs_page(db, cursor, limit)
+        etag = representation_etag(rows_etag(result["items"]))
+    else:
+        result = ProgramService.get_programs(db, skip, limit)
+        etag = representation_etag(rows_etag(result))
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    response.headers["ETag"] = etag
+    return result
+
+@program_router.get("/stats", response_model=EnrollmentStats)
+@handle_exceptions
+async def get_enrollment_stats(program_id: Optional[int] = None,
+                group_by: List[Literal["gender", "age_band", "month"]] = Query(STATS_DIMENSIONS, description="Dimensions to break counts down by"),
+                start_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="First enrollment month (YYYY-MM)"),
+                end_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="Last enrollment month (YYYY-MM)"),
+                db: Session = Depends(get_read_db)):
+    """Enrollment counts per program by gender, age band and enrollment month"""
+    return EnrollmentStatsService.get_stats(db, program_id, group_by, start_month, end_month)
+
+@program_router.get("/{program_id}/clients", response_model=ProgramClientPage)
+@handle_exceptions
+async def get_program_clients(program_id: int,
+                limit: int = Query(100, ge=1, le=1000, description="Maximum clients per page"),
+                cursor: Optional[str] = Query(None, description="Keyset pagination cursor from the previous page"),
+                db: Session = Depends(get_read_db)):
+    """List the clients enrolled in a program"""
+    return ProgramService.get_program_clients_page(db, program_id, cursor, limit)
 
 # ----- Client Routes -----
 
 @client_router.post("/", response_model=Client, status_code=status.HTTP_201_CREATED)
 @handle_exceptions
-async def create_client(client: ClientCreate, db: Session = Depends(get_db)):
+async def create_client(client: ClientCreate, response: Response,
+                key: Optional[str] = Depends(idempotency_key), db: Session = Depends(get_write_db)):
     """Register a new client"""
-    return ClientService.create_client(db, client)
+    return idempotent_write(db, key, "POST /clients/", client, response,
+                            lambda commit: Client.model_validate(
+                                ClientService.create_client(db, client, commit)).model_dump(mode="json"))
+
+@client_router.post("/bulk", response_model=BulkResult)
+@handle_exceptions
+async def create_clients_bulk(clients: List[Any], db: Session = Depends(get_write_db)):
+    """Register many clients in one transaction; invalid rows are reported without aborting the batch"""
+    return ClientService.bulk_create_clients(db, clients)
+
+@client_router.post("/enrollments/bulk", response_model=BulkResult)
+@handle_exceptions
+async def enroll_clients_bulk(enrollments: List[Any], db: Session = Depends(get_write_db)):
+    """Enroll many clients in one transaction; invalid or duplicate rows are reported without aborting the batch"""
+    return EnrollmentService.bulk_enroll_clients(db, enrollments)
 
-# Define ClientWithEnrollments model for response
-class ClientWithEnrollments(Client):
-    enrollments: List[ProgramEnrollment] = []
+@client_router.get("/export", response_class=StreamingResponse)
+async def export_clients(format: Literal["ndjson", "csv"] = Query("ndjson", description="Export format"),
+                sessions: Callable[[], Session] = Depends(get_read_sessionmaker)):
+    """Stream the full client registry with enrollments as NDJSON or CSV"""
+    if format == "csv":
+        export, media_type = ClientService.export_clients_csv, "text/csv"
+    else:
+        export, media_type = ClientService.export_clients_ndjson, "application/x-ndjson"
+    
+    def stream():
+        # The stream owns its session, since request dependencies are torn down before the body is sent
+        with sessions() as db:
+            yield from export(db)
+    
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="clients.{format}"'}
+    )
 
-@client_router.get("/", response_model=List[ClientWithEnrollments])
-async def get_clients(search: Optional[str] = Query(None, description="Search by name or contact info"),
-                skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@client_router.get("/", response_model=Union[List[ClientWithEnrollments], ClientPage])
+@handle_exceptions
+async def get_clients(request: Request, response: Response,
+                search: Optional[str] = Query(None, description="Search by name or contact info"),
+                prefix: bool = Query(True, description="Match search terms anywhere in a word; false matches whole words only"),
+                fuzzy: bool = Query(False, description="Also match terms within a small spelling distance"),
+                skip: int = Query(0, ge=0), limit: int = Depends(page_limit),
+                cursor: Optional[str] = Query(None, description="Keyset pagination cursor; pass an empty value for the first page"),
+                fields: Optional[List[str]] = Depends(client_fields),
+                db: Session = Depends(get_read_db)):
     """Search or list registered clients"""
-    if search:
-        return ClientService.search_clients(db, search, skip, limit)
-    return ClientService.get_clients(db, skip, limit)
+    not_modified = etag_check(request, response)
+    if cursor is not None:
+        if search:
+            result = ClientService.search_clients_page(db, search, cursor, limit, prefix=prefix, fuzzy=fuzzy,
+                                                       not_modified=not_modified, fields=fields)
+        else:
+            result = ClientService.get_clients_page(db, cursor, limit, not_modified=not_modified, fields=fields)
+    elif search:
+        result = ClientService.search_clients(db, search, skip, limit, prefix=prefix, fuzzy=fuzzy,
+                                              not_modified=not_modified, fields=fields)
+    else:
+        result = ClientService.get_clients(db, skip, limit, not_modified=not_modified, fields=fields)
+    if result is None:
+        return not_modified_response(response.headers["ETag"])
+    return json_response(result, response)
 
 @client_router.get("/{client_id}", response_model=ClientProfile)
-async def get_client(client_id: int, db: Session = Depends(get_db)):
+async def get_client(client_id: int, request: Request, response: Response,
+                fields: Optional[List[str]] = Depends(client_fields), db: Session = Depends(get_read_db)):
     """View a specific client's profile (including program enrollments)"""
-    return get_validated_client_profile(client_id, db)
+    return get_conditional_client_profile(client_id, db, request, response, fields)
 
 # ----- Enrollment Routes -----
 
 @enrollment_router.post("/", response_model=Enrollment, status_code=status.HTTP_201_CREATED)
 @handle_exceptions
-async def enroll_client(client_id: int, enrollment: EnrollmentCreate, db: Session = Depends(get_db)):
+async def enroll_client(client_id: int, enrollment: EnrollmentCreate, response: Response,
+                key: Optional[str] = Depends(idempotency_key), db: Session = Depends(get_write_db)):
     """Enroll a client in a program"""
     logger.info(f"Enrollment request received: client_id={client_id}, data={enrollment}")
-    result = EnrollmentService.enroll_client(db, client_id, enrollment)
+    result = idempotent_write(db, key, f"POST /clients/{client_id}/enrollments/", enrollment, response,
+                              lambda commit: EnrollmentService.enroll_client(db, client_id, enrollment, commit))
     logger.info(f"Enrollment successful: {result}")
     return result
 
 # ----- API Routes (with authentication) -----
 
 @api_router.get("/clients/{client_id}", response_model=ClientProfile)
-async def get_client_profile_api(client_id: int, db: Session = Depends(get_db), api_key: str = Security(get_api_key)):
+async def get_client_profile_api(client_id: int, request: Request, response: Response,
+                fields: Optional[List[str]] = Depends(client_fields),
+                db: Session = Depends(get_read_db), api_key: str = Security(get_api_key)):
     """View a specific client's profile via secure API"""
-    return get_validated_client_profile(client_id, db) 
\ No newline at end of file
+    return get_conditional_client_profile(client_id, db, request, response, fields)
+
+@api_router.post("/clients/batch", response_model=ClientBatchResult)
+@handle_exceptions
+async def get_client_profiles_batch(batch: ClientBatchRequest, db: Session = Depends(get_read_db),
+                api_key: str = Security(get_api_key)):
+    """View many clients' profiles in one call; IDs that do not exist are reported inline"""
+    return json_response(ClientService.get_client_profiles(db, batch.ids))
+
+@api_router.get("/changes", response_model=ChangeFeed)
+@handle_exceptions
+async def get_changes(since: Optional[datetime] = Query(None, description="Return changes at or after this UTC time"),
+                cursor: Optional[str] = Query(None, description="Resume from the next_cursor of a previous call"),
+                limit: int = Query(100, ge=1, le=1000, description="Maximum changes per entity type"),
+                db: Session = Depends(get_read_db), api_key: str = Security(get_api_key)):
+    """Incremental change feed of clients, programs and enrollments for partner sync"""
+    return ChangeFeedService.get_changes(db, since, cursor, limit)
+
+@api_router.get("/reports/cohorts", response_model=CohortReport)
+@handle_exceptions
+async def get_cohort_report(period: Literal["month", "quarter", "year"] = "month",
+                program_id: Optional[int] = None,
+                start: Optional[date] = Query(None, description="First enrollment date to include"),
+                end: Optional[date] = Query(None, description="Last enrollment date to include"),
+                db: Session = Depends(get_read_db), api_key: str = Security(get_api_key)):
+    """Enrollments per program by gender, age band at enrollment and enrollment period"""
+    return CohortAnalytics.cohort_report(db, period, program_id, start, end)
+
+# ----- Admin Routes -----
+
+@admin_router.get("/cache")
+async def get_cache_stats():
+    """Hit/miss counters and size of the client profile and API key caches, the program catalog
+    version and API key rate limiting counters"""
+    return {"profile": get_profile_cache().stats(), "programs": get_program_catalog().stats(),
+            "api_keys": get_api_key_cache().stats(), "rate_limits": get_rate_limiter().stats()}
+
+@admin_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request latency and SQL statement metrics in the Prometheus text format"""
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4")
+
+@admin_router.get("/slow-queries")
+async def get_slow_queries(limit: int = Query(50, ge=1, description="Most recent entries to return")):
+    """Statements slower than the threshold, newest first, with parameters and query plans"""
+    recorder = get_slow_query_recorder()
+    return {**recorder.stats(), "entries": recorder.entries(limit)}
+
+@admin_router.delete("/slow-queries", status_code=status.HTTP_204_NO_CONTENT)
+async def clear_slow_queries():
+    """Empty the slow query log"""
+    get_slow_query_recorder().clear()
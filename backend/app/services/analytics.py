@@ -0,0 +1,152 @@
+from collections import Counter
+from datetime import date
+
+import numpy as np
+from sqlalchemy import String, case, select, type_coerce
+from sqlalchemy.orm import Session
+
+from ..models.models import Client, Enrollment
+from .services import AGE_BANDS, OLDEST_AGE_BAND, UNKNOWN_GENDER, ProgramService
+from .catalog import get_program_catalog
+
+# Number of enrollments loaded into each set of column arrays
+ANALYTICS_BATCH_SIZE = 100000
+
+# Time buckets a cohort report can be broken down by
+PERIODS = ["month", "quarter", "year"]
+
+# Gender codes used while the data is held in integer arrays
+GENDER_LABELS = [UNKNOWN_GENDER, "male", "female", "other"]
+AGE_BAND_LABELS = [band for _, band in AGE_BANDS] + [OLDEST_AGE_BAND]
+_AGE_BAND_BOUNDS = np.array([upper for upper, _ in AGE_BANDS])
+
+# Group keys are packed into one int64 (program, gender, age band, period) so a batch
+# is grouped with a 1-D sort; periods are offset to stay non-negative before 1970
+_PERIOD_BITS = 20
+_PERIOD_OFFSET = 1 << (_PERIOD_BITS - 1)
+
+
+def _year_month_day(dates):
+    """Split a datetime64[D] array into integer year, month (1-12) and day (1-31) arrays"""
+    months = dates.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]")
+    return (
+        years.astype(np.int64) + 1970,
+        (months - years).astype(np.int64) + 1,
+        (dates - months).astype(np.int64) + 1,
+    )
+
+
+def age_bands(dates_of_birth, on_dates):
+    """Vectorized services.age_band: age band index of each person at the matching date"""
+    birth_year, birth_month, birth_day = _year_month_day(dates_of_birth)
+    year, month, day = _year_month_day(on_dates)
+    had_birthday = (month * 32 + day) >= (birth_month * 32 + birth_day)
+    ages = year - birth_year - 1 + had_birthday
+    return np.searchsorted(_AGE_BAND_BOUNDS, ages, side="right")
+
+
+def period_buckets(dates, period: str):
+    """Bucket a datetime64[D] array into months, quarters or years (as integers since 1970)"""
+    if period == "year":
+        return dates.astype("datetime64[Y]").astype(np.int64)
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    return months // 3 if period == "quarter" else months
+
+
+def period_label(bucket: int, period: str):
+    """Format an integer period bucket as YYYY-MM, YYYY-Qn or YYYY"""
+    if period == "year":
+        return str(1970 + bucket)
+    if period == "quarter":
+        return f"{1970 + bucket // 4}-Q{bucket % 4 + 1}"
+    return f"{1970 + bucket // 12}-{bucket % 12 + 1:02d}"
+
+
+class CohortAnalytics:
+    @staticmethod
+    def iter_column_batches(db: Session, program_id: int = None, start: date = None, end: date = None,
+                            batch_size: int = ANALYTICS_BATCH_SIZE):
+        """Yield enrollments as dicts of NumPy column arrays, fetched batch_size rows at a time
+
+        Dates are fetched as ISO strings and gender as an integer code, so the
+        arrays are built by NumPy's C parsers instead of per-row Python objects.
+        """
+        query = select(
+            Enrollment.program_id,
+            case(
+                *((Client.gender == label, code) for code, label in enumerate(GENDER_LABELS) if code),
+                else_=0
+            ).label("gender"),
+            type_coerce(Client.date_of_birth, String).label("date_of_birth"),
+            type_coerce(Enrollment.enrollment_date, String).label("enrollment_date")
+        ).join(Client, Enrollment.client_id == Client.id)
+        if program_id is not None:
+            query = query.where(Enrollment.program_id == program_id)
+        if start:
+            query = query.where(Enrollment.enrollment_date >= start)
+        if end:
+            query = query.where(Enrollment.enrollment_date <= end)
+
+        # Read plain tuples straight from the DBAPI cursor: building Row objects would
+        # dominate on large batches, and every column above needs no result processing.
+        # (No stream_results: its buffering strategy pre-fetches rows from the cursor.)
+        result = db.connection().execute(query)
+        try:
+            while True:
+                rows = result.cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                program_ids, genders, dates_of_birth, enrollment_dates = zip(*rows)
+                yield {
+                    "program_id": np.array(program_ids, dtype=np.int64),
+                    "gender": np.array(genders, dtype=np.int64),
+                    "date_of_birth": np.array(dates_of_birth, dtype="datetime64[D]"),
+                    "enrollment_date": np.array(enrollment_dates, dtype="datetime64[D]"),
+                }
+        finally:
+            result.close()
+
+    @staticmethod
+    def count_batch(columns, period: str):
+        """Count one batch of enrollments per (program, gender, age band, period) with a single np.unique"""
+        keys = columns["program_id"] * len(GENDER_LABELS) + columns["gender"]
+        keys = keys * len(AGE_BAND_LABELS) + age_bands(columns["date_of_birth"], columns["enrollment_date"])
+        keys = (keys << _PERIOD_BITS) + period_buckets(columns["enrollment_date"], period) + _PERIOD_OFFSET
+        packed, counts = np.unique(keys, return_counts=True)
+
+        buckets = (packed & ((1 << _PERIOD_BITS) - 1)) - _PERIOD_OFFSET
+        packed >>= _PERIOD_BITS
+        packed, bands = np.divmod(packed, len(AGE_BAND_LABELS))
+        program_ids, genders = np.divmod(packed, len(GENDER_LABELS))
+        return Counter(dict(zip(
+            zip(program_ids.tolist(), genders.tolist(), bands.tolist(), buckets.tolist()), counts.tolist()
+        )))
+
+    @staticmethod
+    def cohort_report(db: Session, period: str = "month", program_id: int = None,
+                      start: date = None, end: date = None, batch_size: int = ANALYTICS_BATCH_SIZE):
+        """Enrollments per program by gender, age band at enrollment and enrollment period"""
+        if period not in PERIODS:
+            raise ValueError(f"Period must be one of: {', '.join(PERIODS)}")
+        if program_id is not None:
+            ProgramService.verify_program_exists(db, program_id)
+
+        counts = Counter()
+        for columns in CohortAnalytics.iter_column_batches(db, program_id, start, end, batch_size):
+            counts.update(CohortAnalytics.count_batch(columns, period))
+
+        program_names = get_program_catalog().names(db, {group[0] for group in counts})
+        groups = sorted(counts, key=lambda group: (program_names[group[0]], group[3], group[1], group[2]))
+        rows = [
+            {
+                "program_id": group_program_id,
+                "program_name": program_names[group_program_id],
+                "gender": GENDER_LABELS[gender],
+                "age_band": AGE_BAND_LABELS[band],
+                "period": period_label(bucket, period),
+                "count": counts[(group_program_id, gender, band, bucket)]
+            }
+            for group_program_id, gender, band, bucket in groups
+        ]
+        return {"period": period, "total": sum(counts.values()), "rows": rows}
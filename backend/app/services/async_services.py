@@ -0,0 +1,204 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from datetime import date, datetime
+
+from ..models.models import Program, Client, Enrollment
+from ..models.schemas import ProgramCreate, ClientCreate, EnrollmentCreate
+from .services import ProgramService, ClientService, EnrollmentService, EnrollmentStatsService, rows_etag
+from .cache import get_profile_cache
+from .catalog import get_program_catalog
+
+# Async counterparts of the services in services.py. Simple lookups and writes are
+# issued natively on the AsyncSession; the larger query builders (search, keyset
+# pages) are shared with the synchronous services through AsyncSession.run_sync,
+# which runs them on the async driver without blocking the event loop.
+
+
+class AsyncProgramService:
+    @staticmethod
+    async def create_program(db: AsyncSession, program: ProgramCreate):
+        """Create a new health program"""
+        db_program = Program(name=program.name, description=program.description)
+
+        try:
+            db.add(db_program)
+            await db.commit()
+            await db.refresh(db_program)
+            get_program_catalog().invalidate()
+            return db_program
+        except IntegrityError:
+            await db.rollback()
+            raise ValueError(f"Program with name '{program.name}' already exists")
+
+    @staticmethod
+    async def get_programs(db: AsyncSession, skip: int = 0, limit: int = 100):
+        """Get all health programs"""
+        result = await db.scalars(select(Program).offset(skip).limit(limit))
+        return result.all()
+
+    @staticmethod
+    async def get_programs_page(db: AsyncSession, cursor: str = None, limit: int = 100):
+        """Get a page of health programs ordered by (name, id), starting after the cursor"""
+        return await db.run_sync(ProgramService.get_programs_page, cursor, limit)
+
+    @staticmethod
+    async def get_program_by_id(db: AsyncSession, program_id: int):
+        """Get a program by ID"""
+        return await db.get(Program, program_id)
+
+    @staticmethod
+    async def verify_program_exists(db: AsyncSession, program_id: int):
+        """Verify that a program exists and return its name or raise a ValueError"""
+        return await db.run_sync(ProgramService.verify_program_exists, program_id)
+
+
+class AsyncClientService:
+    @staticmethod
+    async def create_client(db: AsyncSession, client: ClientCreate, commit: bool = True):
+        """Register a new client; with commit=False it is only flushed, for the caller to commit"""
+        db_client = Client(
+            name=client.name,
+            date_of_birth=client.date_of_birth,
+            contact_info=client.contact_info,
+            gender=ClientService._to_gender(client.gender)
+        )
+        db.add(db_client)
+        if commit:
+            await db.commit()
+            await db.refresh(db_client)
+        else:
+            await db.flush()
+        get_profile_cache().delete(db_client.id)
+        return db_client
+
+    @staticmethod
+    async def get_clients(db: AsyncSession, skip: int = 0, limit: int = 100, not_modified=None, fields=None):
+        """Get all clients with their enrollments"""
+        return await db.run_sync(ClientService.get_clients, skip, limit, not_modified, fields)
+
+    @staticmethod
+    async def search_clients(db: AsyncSession, search: str, skip: int = 0, limit: int = 100,
+                             prefix: bool = True, fuzzy: bool = False, not_modified=None, fields=None):
+        """Search clients by name or contact info, best matches first"""
+        return await db.run_sync(
+            lambda session: ClientService.search_clients(
+                session, search, skip, limit, prefix=prefix, fuzzy=fuzzy, not_modified=not_modified, fields=fields
+            )
+        )
+
+    @staticmethod
+    async def get_clients_page(db: AsyncSession, cursor: str = None, limit: int = 100, not_modified=None, fields=None):
+        """Get a keyset-paginated page of clients with their enrollments"""
+        return await db.run_sync(ClientService.get_clients_page, cursor, limit, not_modified, fields)
+
+    @staticmethod
+    async def search_clients_page(db: AsyncSession, search: str, cursor: str = None, limit: int = 100,
+                                  prefix: bool = True, fuzzy: bool = False, not_modified=None, fields=None):
+        """Search clients with keyset pagination; pages are ordered by id rather than rank"""
+        return await db.run_sync(
+            lambda session: ClientService.search_clients_page(
+                session, search, cursor, limit, prefix=prefix, fuzzy=fuzzy, not_modified=not_modified, fields=fields
+            )
+        )
+
+    @staticmethod
+    async def get_client_by_id(db: AsyncSession, client_id: int):
+        """Get a client by ID"""
+        return await db.get(Client, client_id)
+
+    @staticmethod
+    async def verify_client_exists(db: AsyncSession, client_id: int):
+        """Verify that a client exists and return it or raise a ValueError"""
+        client = await AsyncClientService.get_client_by_id(db, client_id)
+        if not client:
+            raise ValueError(f"Client with ID {client_id} not found")
+        return client
+
+    @staticmethod
+    async def get_client_etag(db: AsyncSession, client_id: int):
+        """Get the version tag of a client's profile from its row alone, or None if it does not exist"""
+        result = await db.execute(select(Client.id, Client.updated_at).where(Client.id == client_id))
+        client = result.first()
+        return rows_etag([client]) if client else None
+
+    @staticmethod
+    async def get_client_profile(db: AsyncSession, client_id: int, etag: str = None, fields=None):
+        """Get a client profile with their program enrollments, served from the profile cache when possible"""
+        if fields is not None:
+            return await db.run_sync(ClientService.get_client_profile, client_id, etag, fields)
+        cache = get_profile_cache()
+        cached = cache.get(client_id)
+        if cached is not None and (etag is None or cached[0] == etag):
+            return cached[1]
+
+        profile = await AsyncClientService._build_client_profile(db, client_id)
+        if profile is not None:
+            cache.set(client_id, (etag, profile))
+        return profile
+
+    @staticmethod
+    async def _build_client_profile(db: AsyncSession, client_id: int):
+        """Helper method to build a client profile from the database"""
+        db_client = await AsyncClientService.get_client_by_id(db, client_id)
+
+        if db_client is None:
+            return None
+
+        # Get enrollments with program information
+        result = await db.execute(
+            select(
+                Enrollment.program_id,
+                Enrollment.enrollment_date
+            ).where(
+                Enrollment.client_id == client_id
+            )
+        )
+        rows = result.all()
+        program_names = await db.run_sync(get_program_catalog().names, {row.program_id for row in rows})
+        program_enrollments = ClientService._create_program_enrollments(rows, program_names)
+
+        return ClientService._client_to_dict(db_client, program_enrollments)
+
+
+class AsyncEnrollmentService:
+    @staticmethod
+    async def enroll_client(db: AsyncSession, client_id: int, enrollment: EnrollmentCreate, commit: bool = True):
+        """Enroll a client in a health program; with commit=False the enrollment is only
+        flushed, for the caller to commit"""
+        # Verify client and program exist
+        client = await AsyncClientService.verify_client_exists(db, client_id)
+        program_name = await AsyncProgramService.verify_program_exists(db, enrollment.program_id)
+
+        db_enrollment = Enrollment(
+            client_id=client_id,
+            program_id=enrollment.program_id,
+            enrollment_date=enrollment.enrollment_date if enrollment.enrollment_date else date.today()
+        )
+
+        # Enrollment state is part of the client's version (used for ETags)
+        client.updated_at = datetime.utcnow()
+
+        try:
+            db.add(db_enrollment)
+            await db.flush()
+            await db.run_sync(EnrollmentStatsService.record, [
+                (db_enrollment.program_id, client.gender, client.date_of_birth, db_enrollment.enrollment_date)
+            ])
+            # Built before the commit expires the instance, with the program from the catalog
+            result = EnrollmentService._enrollment_to_dict(db_enrollment, program_name)
+            if commit:
+                await db.commit()
+
+            get_profile_cache().delete(client_id)
+            return result
+        except IntegrityError:
+            await db.rollback()
+            raise ValueError(f"Client {client_id} is already enrolled in program {enrollment.program_id}")
+
+    @staticmethod
+    async def get_client_enrollments(db: AsyncSession, client_id: int):
+        """Get all enrollments for a client"""
+        await AsyncClientService.verify_client_exists(db, client_id)
+        result = await db.scalars(select(Enrollment).where(Enrollment.client_id == client_id))
+        return result.all()
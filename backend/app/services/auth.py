@@ -1,9 +1,20 @@
+import hashlib
+import hmac
+import math
 import os
+import secrets
+from datetime import datetime
 from fastapi import Security, HTTPException, Depends
 from fastapi.security.api_key import APIKeyHeader
-from starlette.status import HTTP_403_FORBIDDEN
+from sqlalchemy.orm import Session
+from starlette.status import HTTP_403_FORBIDDEN, HTTP_429_TOO_MANY_REQUESTS
 from dotenv import load_dotenv
 
+from ..database.database import get_db
+from ..models.models import ApiKey
+from .cache import InMemoryCache
+from .rate_limit import get_rate_limiter, API_RATE_LIMIT_PER_MINUTE, API_RATE_LIMIT_BURST
+
 # Load environment variables
 load_dotenv()
 
@@ -11,14 +22,123 @@ load_dotenv()
 API_KEY = os.getenv("API_KEY", "dev_api_key_for_testing")
 API_KEY_NAME = "X-API-Key"
 
+# Partner keys resolved from the database are cached for this many seconds, so a
+# revoked key keeps working on a worker for at most this long
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+# Unknown keys are remembered briefly, in a separate cache so a flood of bad keys
+# neither queries the database each time nor evicts valid keys
+API_KEY_REJECTED_CACHE_TTL = float(os.getenv("API_KEY_REJECTED_CACHE_TTL", "10"))
+
+# Prefix of generated partner keys
+PARTNER_KEY_PREFIX = "bhis_"
+
 # Define API Key header
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
+# Partner key identities ({"id", "partner", "rate_limit"}) keyed by key hash
+_key_cache = InMemoryCache(maxsize=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL)
+_rejected_key_cache = InMemoryCache(maxsize=API_KEY_CACHE_SIZE, ttl=API_KEY_REJECTED_CACHE_TTL)
+
+
+def hash_api_key(api_key: str) -> str:
+    """SHA-256 hex digest of a key; keys are random, so a fast unsalted hash suffices"""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def get_api_key_cache() -> InMemoryCache:
+    """Get the cache of resolved partner keys"""
+    return _key_cache
+
+
+def invalidate_api_keys():
+    """Drop cached key lookups (after this process created or revoked keys)"""
+    _key_cache.clear()
+    _rejected_key_cache.clear()
+
+
+class ApiKeyService:
+    @staticmethod
+    def create_key(db: Session, partner: str, rate_limit: int = None):
+        """Issue a key for a partner; returns the key, which is not stored, and its record"""
+        if rate_limit is not None and rate_limit <= 0:
+            raise ValueError("Rate limit must be a positive number of requests per minute")
+        api_key = PARTNER_KEY_PREFIX + secrets.token_urlsafe(32)
+        record = ApiKey(partner=partner, key_prefix=api_key[:len(PARTNER_KEY_PREFIX) + 6],
+                        key_hash=hash_api_key(api_key), rate_limit=rate_limit)
+        db.add(record)
+        db.commit()
+        db.refresh(record)
+        invalidate_api_keys()
+        return api_key, record
+
+    @staticmethod
+    def revoke_key(db: Session, key_id: int):
+        """Deactivate a key; other workers stop accepting it within API_KEY_CACHE_TTL"""
+        record = db.query(ApiKey).filter(ApiKey.id == key_id).first()
+        if not record:
+            raise ValueError(f"API key with ID {key_id} not found")
+        if record.active:
+            record.active = False
+            record.revoked_at = datetime.utcnow()
+            db.commit()
+        invalidate_api_keys()
+        return record
+
+    @staticmethod
+    def list_keys(db: Session):
+        """Get every issued key's record"""
+        return db.query(ApiKey).order_by(ApiKey.id).all()
+
+    @staticmethod
+    def resolve(db: Session, api_key: str):
+        """Get the identity of an active partner key, or None, querying the database only on a cache miss"""
+        key_hash = hash_api_key(api_key)
+        identity = _key_cache.get(key_hash)
+        if identity is not None:
+            return identity
+        if _rejected_key_cache.get(key_hash) is not None:
+            return None
+        record = db.query(ApiKey).filter(ApiKey.key_hash == key_hash, ApiKey.active.is_(True)).first()
+        if record is None:
+            _rejected_key_cache.set(key_hash, True)
+            return None
+        identity = {"id": record.id, "partner": record.partner, "rate_limit": record.rate_limit}
+        _key_cache.set(key_hash, identity)
+        return identity
+
+
+def _is_static_key(api_key: str) -> bool:
+    return hmac.compare_digest(api_key.encode(), API_KEY.encode())
+
+
+# Operator key validation function
+async def get_admin_key(api_key_header: str = Security(api_key_header)):
+    """Accept only the static API_KEY; partner keys have no access to operational endpoints"""
+    if api_key_header and _is_static_key(api_key_header):
+        return api_key_header
+    raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="Invalid API Key")
+
+
 # API Key validation function
-async def get_api_key(api_key_header: str = Security(api_key_header)):
-    if api_key_header == API_KEY:
+async def get_api_key(api_key_header: str = Security(api_key_header), db: Session = Depends(get_db)):
+    """Accept the static API_KEY (not rate limited) or an active partner key within its rate limit"""
+    if not api_key_header:
+        raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="Invalid API Key")
+    if _is_static_key(api_key_header):
         return api_key_header
-    else:
+
+    identity = ApiKeyService.resolve(db, api_key_header)
+    if identity is None:
+        raise HTTPException(status_code=HTTP_403_FORBIDDEN, detail="Invalid API Key")
+    per_minute = identity["rate_limit"] or API_RATE_LIMIT_PER_MINUTE
+    # A burst above the key's own limit would let it exceed that limit within a minute
+    retry_after = get_rate_limiter().acquire(
+        f"api_key:{identity['id']}", per_minute, min(API_RATE_LIMIT_BURST, per_minute)
+    )
+    if retry_after:
         raise HTTPException(
-            status_code=HTTP_403_FORBIDDEN, detail="Invalid API Key"
-        ) 
\ No newline at end of file
+            status_code=HTTP_429_TOO_MANY_REQUESTS, detail="API rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    return api_key_header
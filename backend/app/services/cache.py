@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Profile cache sizing, configurable through the environment
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+
+
+class CacheBackend:
+    """Interface for cache storage backends (in-process today, shared e.g. Redis later)"""
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """Store a value under key"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove key from the cache if present"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove every entry"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        raise NotImplementedError
+
+
+class InMemoryCache(CacheBackend):
+    """Thread-safe, size-bounded LRU cache whose entries expire after a TTL"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self).__name__,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Cache of ClientProfile-shaped dictionaries keyed by client ID
+_profile_cache = InMemoryCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+
+
+def get_profile_cache() -> CacheBackend:
+    """Get the active client profile cache"""
+    return _profile_cache
+
+
+def set_profile_cache(backend: CacheBackend):
+    """Replace the client profile cache, e.g. with a shared backend"""
+    global _profile_cache
+    _profile_cache = backend
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..models.models import Program
+
+# Seconds between checks of the database version stamp for programs changed by other workers
+PROGRAM_CATALOG_CHECK_SECONDS = float(os.getenv("PROGRAM_CATALOG_CHECK_SECONDS", "5"))
+
+
+class ProgramCatalog:
+    """In-process map of program IDs to names, versioned against the programs table
+
+    The catalog is small and rarely changes, so enrollment validation and profile
+    assembly resolve programs from it instead of querying or joining the programs
+    table. Consistency across workers:
+
+    - every PROGRAM_CATALOG_CHECK_SECONDS the version stamp (program count, highest ID
+      and latest update time) is read and the catalog reloaded when it changed;
+    - an ID that is not in the catalog triggers an immediate reload, so a program
+      created by another worker is seen by the next request that uses it;
+    - create_program invalidates the catalog of the worker that wrote it.
+    """
+
+    def __init__(self, check_seconds: float = PROGRAM_CATALOG_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._names = None
+        self._version = None
+        self._check_at = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.checks = 0
+
+    @staticmethod
+    def _stamp_query():
+        return select(func.count(Program.id), func.max(Program.id), func.max(Program.updated_at))
+
+    def load(self, db: Session):
+        """Reload every program in one query and return the ID to name map"""
+        rows = db.execute(select(Program.id, Program.name, Program.updated_at)).all()
+        names = {row.id: row.name for row in rows}
+        # Same stamp as _stamp_query computes in SQL
+        version = (
+            len(rows),
+            max(names, default=None),
+            max((row.updated_at for row in rows if row.updated_at is not None), default=None),
+        )
+        with self._lock:
+            self._names, self._version = names, version
+            self._check_at = time.monotonic() + self.check_seconds
+            self.loads += 1
+        return names
+
+    def names(self, db: Session, require=()):
+        """Get the ID to name map, reloading it when stale or when a required ID is missing"""
+        names = self._names
+        if names is None:
+            names = self.load(db)
+        elif time.monotonic() >= self._check_at:
+            self.checks += 1
+            if tuple(db.execute(self._stamp_query()).one()) != self._version:
+                names = self.load(db)
+            else:
+                self._check_at = time.monotonic() + self.check_seconds
+        if any(program_id not in names for program_id in require):
+            names = self.load(db)
+        return names
+
+    def get_name(self, db: Session, program_id: int):
+        """Get a program's name, or None if it does not exist"""
+        return self.names(db, (program_id,)).get(program_id)
+
+    def invalidate(self):
+        """Drop the loaded programs so the next use reloads them (after this worker changed programs)"""
+        with self._lock:
+            self._names = None
+            self._version = None
+            self._check_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "programs": len(self._names) if self._names is not None else None,
+                "version": [str(part) for part in self._version] if self._version else None,
+                "loads": self.loads,
+                "checks": self.checks,
+            }
+
+
+_catalog = ProgramCatalog()
+
+
+def get_program_catalog() -> ProgramCatalog:
+    """Get the process-wide program catalog"""
+    return _catalog
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from ..models.models import IdempotencyKey
+from .serialization import dumps
+
+# How long a completed request's response is replayed to retries with the same key
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+# Longest accepted Idempotency-Key header
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# Minimum seconds between deletions of expired keys (per process)
+IDEMPOTENCY_PURGE_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "60"))
+
+_purge_at = 0.0
+
+
+class IdempotencyKeyConflict(Exception):
+    """An Idempotency-Key that cannot be honoured: reused for a different request (422)
+    or its original request has not finished (409)"""
+
+    def __init__(self, detail: str, status_code: int):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+def _hash(value: bytes) -> str:
+    return hashlib.sha256(value).hexdigest()
+
+
+class IdempotencyService:
+    """Deduplicates retried writes sent with an Idempotency-Key header
+
+    The key is reserved, the write flushed and its response stored in one
+    transaction, so they commit (or roll back) together: a write is never applied
+    without its stored response, and a concurrent duplicate fails on the key's
+    primary key instead of writing twice. Later retries get the response back
+    without touching the tables the write changed.
+    """
+
+    @staticmethod
+    def fingerprint(scope: str, payload) -> str:
+        """Hash of the route and the request body, to detect a key reused for another request"""
+        body = orjson.dumps(payload.model_dump(mode="json"), option=orjson.OPT_SORT_KEYS)
+        return _hash(scope.encode() + b"\n" + body)
+
+    @staticmethod
+    def _lookup(db: Session, key_hash: str, fingerprint: str):
+        record = db.execute(select(IdempotencyKey).where(IdempotencyKey.key_hash == key_hash)).scalar_one_or_none()
+        if record is None:
+            return None
+        if record.expires_at <= datetime.utcnow():
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key_hash == key_hash))
+            return None
+        if record.fingerprint != fingerprint:
+            raise IdempotencyKeyConflict("Idempotency-Key was already used for a different request", 422)
+        if record.status_code is None:
+            raise IdempotencyKeyConflict("A request with this Idempotency-Key is still being processed", 409)
+        return record.status_code, record.response
+
+    @staticmethod
+    def begin(db: Session, key: str, fingerprint: str):
+        """Get the stored (status_code, body) of a completed request with this key, or
+        reserve the key in the current transaction and return None"""
+        key_hash = _hash(key.encode())
+        stored = IdempotencyService._lookup(db, key_hash, fingerprint)
+        if stored is not None:
+            return stored
+        db.add(IdempotencyKey(key_hash=key_hash, fingerprint=fingerprint,
+                              expires_at=datetime.utcnow() + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)))
+        try:
+            db.flush()
+        except (IntegrityError, OperationalError):
+            # A concurrent request with the same key committed first (or holds the lock)
+            db.rollback()
+            stored = IdempotencyService._lookup(db, key_hash, fingerprint)
+            if stored is None:
+                raise
+            return stored
+        return None
+
+    @staticmethod
+    def complete(db: Session, key: str, status_code: int, content):
+        """Store the response of the write flushed in this transaction, and commit both"""
+        global _purge_at
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key_hash == _hash(key.encode()))
+            .values(status_code=status_code, response=dumps(content))
+        )
+        if time.monotonic() >= _purge_at:
+            IdempotencyService.purge_expired(db)
+            _purge_at = time.monotonic() + IDEMPOTENCY_PURGE_SECONDS
+        db.commit()
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """Delete expired keys (in the caller's transaction); returns how many were deleted"""
+        result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow()))
+        return result.rowcount
@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request metrics and the Server-Timing header can be switched off through the environment
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds: request latency in seconds, and SQL statements per request
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+STATEMENT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+
+class RequestStats:
+    """SQL activity of the request being served, collected by the engine event hooks"""
+    __slots__ = ("statements", "db_seconds", "scope")
+
+    def __init__(self, scope=None):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.scope = scope
+
+    def server_timing(self, total_seconds: float):
+        """Format a Server-Timing header value (durations in milliseconds)"""
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.statements} statements", '
+            f"app;dur={max(total_seconds - self.db_seconds, 0) * 1000:.1f}, "
+            f"total;dur={total_seconds * 1000:.1f}"
+        )
+
+
+# Stats of the current request; None outside of a request (scripts, startup)
+_request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+
+def start_request(scope=None):
+    """Begin collecting SQL stats for the current request; returns (stats, reset token)"""
+    stats = RequestStats(scope)
+    return stats, _request_stats.set(stats)
+
+
+def current_route():
+    """Get the method and route template of the request being served, or None outside of a request"""
+    stats = _request_stats.get()
+    if stats is None or stats.scope is None:
+        return None
+    route = stats.scope.get("route")
+    return f"{stats.scope['method']} {getattr(route, 'path', stats.scope['path'])}"
+
+
+def end_request(token):
+    """Stop collecting SQL stats for the current request"""
+    _request_stats.reset(token)
+
+
+# Start times are kept on the statement's execution context: after_cursor_execute does
+# not fire for statements that fail, so per-connection state would leak and mismatch
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_stats.get() is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    started = getattr(context, "_metrics_query_start", None)
+    if stats is not None and started is not None:
+        stats.db_seconds += time.perf_counter() - started
+        stats.statements += 1
+
+
+def install_sql_instrumentation():
+    """Time every statement on every engine (sync engines and the async engines' sync_engine)"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus cumulative layout"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    """Render a Prometheus label set"""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """In-process request and SQL metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._statements = {}
+        self._db_seconds = {}
+        self._requests = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        """Record one served request"""
+        key = (method, route)
+        with self._lock:
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = Histogram(LATENCY_BUCKETS)
+                self._statements[key] = Histogram(STATEMENT_BUCKETS)
+                self._db_seconds[key] = 0.0
+            latency.observe(seconds)
+            self._statements[key].observe(stats.statements)
+            self._db_seconds[key] += stats.db_seconds
+            self._requests[(method, route, status)] = self._requests.get((method, route, status), 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._latency.clear()
+            self._statements.clear()
+            self._db_seconds.clear()
+            self._requests.clear()
+
+    @staticmethod
+    def _render_histogram(lines, name, histograms):
+        for (method, route), histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                "# HELP bhis_http_requests_total Requests served, by route template and status code.",
+                "# TYPE bhis_http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f"bhis_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+            lines += [
+                "# HELP bhis_http_request_duration_seconds Time to serve a request, including the response body.",
+                "# TYPE bhis_http_request_duration_seconds histogram",
+            ]
+            self._render_histogram(lines, "bhis_http_request_duration_seconds", self._latency)
+
+            lines += [
+                "# HELP bhis_db_statements_per_request SQL statements executed per request.",
+                "# TYPE bhis_db_statements_per_request histogram",
+            ]
+            self._render_histogram(lines, "bhis_db_statements_per_request", self._statements)
+
+            lines += [
+                "# HELP bhis_db_duration_seconds_total Time spent executing SQL statements, by route.",
+                "# TYPE bhis_db_duration_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self._db_seconds.items()):
+                lines.append(f"bhis_db_duration_seconds_total{_labels(method=method, route=route)} {seconds}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    return _registry
@@ -0,0 +1,33 @@
+import base64
+import json
+
+# Largest page a keyset (cursor) listing returns
+MAX_PAGE_LIMIT = 1000
+
+
+def encode_cursor(*values) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types):
+    """Decode a cursor into its sort key values, or None for the first page
+    
+    types holds the type (or tuple of types, as for isinstance) of each key column;
+    a cursor whose values do not match them is rejected like an undecodable one.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Invalid pagination cursor")
+    for value, expected in zip(values, types):
+        # JSON true/false decode to bool, which isinstance would accept as int
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError("Invalid pagination cursor")
+    return values
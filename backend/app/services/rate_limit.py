@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+# Default per-key limit for partner API keys without their own, and the burst a key
+# may spend at once before being held to the steady rate
+API_RATE_LIMIT_PER_MINUTE = int(os.getenv("API_RATE_LIMIT_PER_MINUTE", "600"))
+API_RATE_LIMIT_BURST = int(os.getenv("API_RATE_LIMIT_BURST", "60"))
+
+
+class RateLimiterBackend:
+    """Interface for rate limiter storage (in-process today, shared e.g. Redis later)"""
+
+    def acquire(self, key, per_minute: int, burst: int) -> float:
+        """Take one request from key's allowance; return 0 if allowed, else the
+        seconds until the next request would be"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Forget every key's usage"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Return allowed/limited counters and the number of tracked keys"""
+        raise NotImplementedError
+
+
+class TokenBucketLimiter(RateLimiterBackend):
+    """Thread-safe in-process token buckets, one per key
+
+    Each bucket holds up to `burst` tokens and refills at `per_minute / 60` tokens a
+    second; a request takes one token. Limits are per process, so with several
+    workers a key's effective limit is the per-worker limit times the worker count
+    unless a shared backend is configured.
+    """
+
+    def __init__(self):
+        # key -> [tokens, last refill time]
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key, per_minute: int, burst: int) -> float:
+        rate = per_minute / 60.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now]
+            tokens = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                self.allowed += 1
+                return 0.0
+            bucket[0] = tokens
+            self.limited += 1
+            return (1.0 - tokens) / rate if rate > 0 else float("inf")
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self).__name__,
+                "keys": len(self._buckets),
+                "allowed": self.allowed,
+                "limited": self.limited,
+            }
+
+
+_rate_limiter = TokenBucketLimiter()
+
+
+def get_rate_limiter() -> RateLimiterBackend:
+    """Get the active API key rate limiter"""
+    return _rate_limiter
+
+
+def set_rate_limiter(backend: RateLimiterBackend):
+    """Replace the API key rate limiter, e.g. with a shared backend"""
+    global _rate_limiter
+    _rate_limiter = backend
@@ -0,0 +1,205 @@
+import difflib
+import re
+
+from sqlalchemy import Float, Integer, event, false, inspect, or_, text
+from sqlalchemy.orm import Session
+
+from ..models.models import Client
+
+# Name of the FTS5 table that indexes client names and contact info by word (SQLite)
+CLIENT_FTS_TABLE = "clients_fts"
+# Name of the FTS5 table that indexes the same columns by trigram, for substring search
+CLIENT_TRIGRAM_TABLE = "clients_trigram"
+# Shortest term the trigram index can look up; shorter terms are matched with a scan
+TRIGRAM_MIN_LENGTH = 3
+
+# Maximum number of vocabulary terms a misspelled search term is expanded to
+FUZZY_MAX_EXPANSIONS = 5
+FUZZY_CUTOFF = 0.75
+
+_SQLITE_CREATE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {CLIENT_FTS_TABLE} USING fts5(
+        name, contact_info,
+        content='clients', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {CLIENT_FTS_TABLE}_vocab USING fts5vocab({CLIENT_FTS_TABLE}, 'row')",
+    # Triggers keep the index in sync with every write to the clients table
+    f"""CREATE TRIGGER IF NOT EXISTS {CLIENT_FTS_TABLE}_ai AFTER INSERT ON clients BEGIN
+        INSERT INTO {CLIENT_FTS_TABLE}(rowid, name, contact_info)
+        VALUES (new.id, new.name, new.contact_info);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {CLIENT_FTS_TABLE}_ad AFTER DELETE ON clients BEGIN
+        INSERT INTO {CLIENT_FTS_TABLE}({CLIENT_FTS_TABLE}, rowid, name, contact_info)
+        VALUES ('delete', old.id, old.name, old.contact_info);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {CLIENT_FTS_TABLE}_au AFTER UPDATE OF name, contact_info ON clients BEGIN
+        INSERT INTO {CLIENT_FTS_TABLE}({CLIENT_FTS_TABLE}, rowid, name, contact_info)
+        VALUES ('delete', old.id, old.name, old.contact_info);
+        INSERT INTO {CLIENT_FTS_TABLE}(rowid, name, contact_info)
+        VALUES (new.id, new.name, new.contact_info);
+    END""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {CLIENT_TRIGRAM_TABLE} USING fts5(
+        name, contact_info,
+        content='clients', content_rowid='id',
+        tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {CLIENT_TRIGRAM_TABLE}_ai AFTER INSERT ON clients BEGIN
+        INSERT INTO {CLIENT_TRIGRAM_TABLE}(rowid, name, contact_info)
+        VALUES (new.id, new.name, new.contact_info);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {CLIENT_TRIGRAM_TABLE}_ad AFTER DELETE ON clients BEGIN
+        INSERT INTO {CLIENT_TRIGRAM_TABLE}({CLIENT_TRIGRAM_TABLE}, rowid, name, contact_info)
+        VALUES ('delete', old.id, old.name, old.contact_info);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {CLIENT_TRIGRAM_TABLE}_au AFTER UPDATE OF name, contact_info ON clients BEGIN
+        INSERT INTO {CLIENT_TRIGRAM_TABLE}({CLIENT_TRIGRAM_TABLE}, rowid, name, contact_info)
+        VALUES ('delete', old.id, old.name, old.contact_info);
+        INSERT INTO {CLIENT_TRIGRAM_TABLE}(rowid, name, contact_info)
+        VALUES (new.id, new.name, new.contact_info);
+    END""",
+]
+
+_SQLITE_DROP = [
+    f"DROP TABLE IF EXISTS {CLIENT_FTS_TABLE}_vocab",
+    f"DROP TABLE IF EXISTS {CLIENT_FTS_TABLE}",
+    f"DROP TABLE IF EXISTS {CLIENT_TRIGRAM_TABLE}",
+]
+
+# On PostgreSQL trigram indexes make the ILIKE '%term%' filter index-assisted
+_POSTGRES_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_clients_name_trgm ON clients USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_clients_contact_info_trgm ON clients USING gin (contact_info gin_trgm_ops)",
+]
+
+
+class ClientSearchIndex:
+    @staticmethod
+    def create(connection):
+        """Create the search index structures for the connection's dialect"""
+        dialect = connection.dialect.name
+        if dialect == "sqlite":
+            for statement in _SQLITE_CREATE:
+                connection.exec_driver_sql(statement)
+        elif dialect == "postgresql":
+            for statement in _POSTGRES_CREATE:
+                connection.exec_driver_sql(statement)
+
+    @staticmethod
+    def drop(connection):
+        """Drop the search index structures (SQLite only, triggers go with the table)"""
+        if connection.dialect.name == "sqlite":
+            for statement in _SQLITE_DROP:
+                connection.exec_driver_sql(statement)
+
+    @staticmethod
+    def ensure(connection):
+        """Create and populate the search index tables missing from a database created before them"""
+        if connection.dialect.name == "sqlite":
+            missing = [table for table in (CLIENT_FTS_TABLE, CLIENT_TRIGRAM_TABLE)
+                       if not inspect(connection).has_table(table)]
+            if missing:
+                ClientSearchIndex.create(connection)
+            for table in missing:
+                connection.exec_driver_sql(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+        elif connection.dialect.name == "postgresql":
+            ClientSearchIndex.create(connection)
+
+    @staticmethod
+    def _tokenize(search: str):
+        """Split a search string into lowercase word tokens"""
+        return re.findall(r"\w+", search.lower())
+
+    @staticmethod
+    def _fuzzy_terms(db: Session, term: str):
+        """Find indexed terms that are close to a (possibly misspelled) search term"""
+        candidates = db.execute(
+            text(f"SELECT term FROM {CLIENT_FTS_TABLE}_vocab WHERE term >= :low AND term < :high"),
+            {"low": term[0], "high": chr(ord(term[0]) + 1)}
+        ).scalars().all()
+        return difflib.get_close_matches(term, candidates, n=FUZZY_MAX_EXPANSIONS, cutoff=FUZZY_CUTOFF)
+
+    @staticmethod
+    def build_match_query(db: Session, search: str, prefix: bool = True, fuzzy: bool = False):
+        """Build an FTS5 MATCH expression in which every search term must match"""
+        groups = []
+        for term in ClientSearchIndex._tokenize(search):
+            alternatives = [f'"{term}"*' if prefix else f'"{term}"']
+            if fuzzy:
+                alternatives += [f'"{match}"' for match in ClientSearchIndex._fuzzy_terms(db, term) if match != term]
+            groups.append(alternatives[0] if len(alternatives) == 1 else f"({' OR '.join(alternatives)})")
+        return " AND ".join(groups)
+
+    @staticmethod
+    def build_substring_query(db: Session, search: str, fuzzy: bool = False):
+        """Build a trigram MATCH expression in which every search term must occur as a substring
+        
+        Returns the expression (empty when no term is long enough for the trigram index)
+        and the terms too short for it, which are matched with a scan instead.
+        """
+        groups, short_terms = [], []
+        for term in ClientSearchIndex._tokenize(search):
+            if len(term) < TRIGRAM_MIN_LENGTH:
+                short_terms.append(term)
+                continue
+            alternatives = [f'"{term}"']
+            if fuzzy:
+                alternatives += [f'"{match}"' for match in ClientSearchIndex._fuzzy_terms(db, term) if match != term]
+            groups.append(alternatives[0] if len(alternatives) == 1 else f"({' OR '.join(alternatives)})")
+        return " AND ".join(groups), short_terms
+
+    @staticmethod
+    def _contains(term: str):
+        """Filter for clients whose name or contact info contains the term"""
+        pattern = "%" + term.replace("_", "\\_") + "%"
+        return or_(Client.name.ilike(pattern, escape="\\"), Client.contact_info.ilike(pattern, escape="\\"))
+
+    @staticmethod
+    def query_clients(db: Session, search: str, prefix: bool = True, fuzzy: bool = False):
+        """Return a query of clients matching the search, best matches first
+        
+        With prefix matching (the default) each term matches anywhere in the name or
+        contact info, as a substring, through the trigram index; without it, terms match
+        whole words through the word index.
+        """
+        if db.get_bind().dialect.name != "sqlite":
+            return db.query(Client).filter(
+                or_(
+                    Client.name.ilike(f"%{search}%"),
+                    Client.contact_info.ilike(f"%{search}%")
+                )
+            ).order_by(Client.id)
+
+        if prefix:
+            match_query, short_terms = ClientSearchIndex.build_substring_query(db, search, fuzzy)
+            table = CLIENT_TRIGRAM_TABLE
+        else:
+            match_query, short_terms = ClientSearchIndex.build_match_query(db, search, prefix, fuzzy), []
+            table = CLIENT_FTS_TABLE
+        if not match_query and not short_terms:
+            return db.query(Client).filter(false())
+
+        query = db.query(Client)
+        for term in short_terms:
+            query = query.filter(ClientSearchIndex._contains(term))
+        if not match_query:
+            return query.order_by(Client.id)
+
+        matches = text(
+            f"SELECT rowid AS id, rank FROM {table} WHERE {table} MATCH :match_query"
+        ).bindparams(match_query=match_query).columns(id=Integer, rank=Float).subquery()
+
+        return query.join(
+            matches, matches.c.id == Client.id
+        ).order_by(matches.c.rank, Client.id)
+
+
+@event.listens_for(Client.__table__, "after_create")
+def _create_client_search_index(target, connection, **kw):
+    ClientSearchIndex.create(connection)
+
+
+@event.listens_for(Client.__table__, "before_drop")
+def _drop_client_search_index(target, connection, **kw):
+    ClientSearchIndex.drop(connection)
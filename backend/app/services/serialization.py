@@ -0,0 +1,27 @@
+import orjson
+from fastapi import Response
+
+# Response bodies built by the services as plain dicts, lists, dates and strings are
+# encoded straight to bytes instead of being validated again against the route's
+# response_model. The services must therefore emit keys in the schema's field order;
+# orjson then produces the same bytes as FastAPI's JSONResponse (UTF-8, no
+# whitespace, ISO dates, only control characters escaped).
+
+
+def dumps(content) -> bytes:
+    """Encode response content as compact UTF-8 JSON"""
+    return orjson.dumps(content)
+
+
+class FastJSONResponse(Response):
+    """JSON response for content already in its response-model shape"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(content, response: Response = None, status_code: int = 200) -> FastJSONResponse:
+    """Serialize content directly, carrying over headers (e.g. ETag) set on the route's injected response"""
+    headers = dict(response.headers) if response is not None else None
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -1,10 +1,152 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_
+from sqlalchemy import tuple_, insert, select, update, or_, and_, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
-from datetime import date, datetime
+from pydantic import ValidationError
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+import csv
+import hashlib
+import io
+import json
+import os
+
+from ..models.models import Program, Client, Enrollment, EnrollmentStat, Gender
+from ..models.schemas import ProgramCreate, ClientCreate, EnrollmentCreate, BulkEnrollmentCreate, GenderEnum
+from .search import ClientSearchIndex
+from .pagination import encode_cursor, decode_cursor
+from .cache import get_profile_cache
+from .catalog import get_program_catalog
+
+# Maximum number of records accepted by a single bulk request
+BULK_MAX_RECORDS = 5000
+
+# Maximum number of client IDs accepted by a single batch profile lookup
+BATCH_PROFILE_MAX_IDS = 1000
+
+# Number of clients fetched per round trip when streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+# Rows changed within this many seconds are held back from the change feed, so a
+# transaction that stamped its rows before a concurrent one committed is not skipped
+CHANGE_FEED_SETTLE_SECONDS = float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", "1"))
+
+# Column order of the CSV export (one row per enrollment)
+EXPORT_CSV_COLUMNS = [
+    "id", "name", "date_of_birth", "contact_info", "gender",
+    "program_id", "program_name", "enrollment_date"
+]
+
+# Fields of a client in the list and profile responses, in schema order; a sparse
+# fieldset (?fields=id,name) selects a subset of them
+CLIENT_FIELDS = ["name", "date_of_birth", "contact_info", "gender", "id", "enrollments"]
+
+# Exclusive upper age of each age band used in enrollment statistics
+AGE_BANDS = [(5, "0-4"), (15, "5-14"), (25, "15-24"), (35, "25-34"), (45, "35-44"), (55, "45-54"), (65, "55-64")]
+OLDEST_AGE_BAND = "65+"
+
+# Enrollment statistics dimensions, and the gender bucket for clients without one
+STATS_DIMENSIONS = ["gender", "age_band", "month"]
+UNKNOWN_GENDER = "unknown"
+
+
+def age_band(date_of_birth: date, on: date):
+    """Get the age band of a person born on date_of_birth at the given date"""
+    age = on.year - date_of_birth.year - ((on.month, on.day) < (date_of_birth.month, date_of_birth.day))
+    for upper, band in AGE_BANDS:
+        if age < upper:
+            return band
+    return OLDEST_AGE_BAND
+
+
+def parse_client_fields(fields: str):
+    """Parse a sparse fieldset such as "id,name" into client fields in schema order; None selects all"""
+    if fields is None:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(CLIENT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown client field(s): {', '.join(sorted(unknown))}")
+    if not requested:
+        raise ValueError("fields must name at least one client field")
+    return [field for field in CLIENT_FIELDS if field in requested]
+
+
+def _check_bulk_size(records):
+    """Reject bulk requests above the per-call record limit"""
+    if len(records) > BULK_MAX_RECORDS:
+        raise ValueError(f"A bulk request may contain at most {BULK_MAX_RECORDS} records")
+
+
+def validate_records(schema, records, start: int = 0):
+    """Validate raw records against a schema, returning the valid ones and per-row errors
+    
+    Rows are keyed by their index, counted from start.
+    """
+    valid, errors = [], {}
+    for index, record in enumerate(records, start):
+        if not isinstance(record, dict):
+            errors[index] = "Record must be a JSON object"
+            continue
+        try:
+            valid.append((index, schema(**record)))
+        except ValidationError as e:
+            errors[index] = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            )
+    return valid, errors
+
+
+def insert_returning_ids(db: Session, model, rows, match_columns):
+    """Insert rows with multi-row inserts and return their new IDs in the order of rows
+    
+    Neither SQLite nor PostgreSQL guarantees the order of RETURNING rows for a multi-row
+    insert, so IDs are matched back to rows on the inserted values of match_columns
+    (all the columns that distinguish the rows). Rows with identical values are
+    interchangeable, so any of their IDs is correct for each.
+    """
+    returned = db.execute(
+        insert(model).returning(model.id, *(getattr(model, column) for column in match_columns)), rows
+    ).all()
+    ids_by_values = defaultdict(list)
+    for returned_row in returned:
+        ids_by_values[tuple(returned_row[1:])].append(returned_row[0])
+    return [ids_by_values[tuple(row[column] for column in match_columns)].pop() for row in rows]
+
+
+def rows_etag(rows):
+    """Compute the version tag of a list of rows from their IDs and update times"""
+    digest = hashlib.sha1()
+    for row in rows:
+        updated_at = row.updated_at.isoformat() if row.updated_at else ""
+        digest.update(f"{row.id}:{updated_at};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def representation_etag(version: str, fields=None):
+    """Compute the ETag of a response from the version tag of its rows and its sparse fieldset
+    
+    The normalized field list (from parse_client_fields; None for all fields) is part of
+    the tag, so a sparse response never validates the full one or another fieldset. ETags
+    are weak: responses with the same content are interchangeable even when encoded.
+    """
+    selected = ",".join(fields) if fields is not None else "*"
+    digest = hashlib.sha1(f"{version};fields={selected}".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _bulk_result(size, created_ids, errors):
+    """Combine created IDs and row errors into a bulk result ordered by row index"""
+    results = []
+    for index in range(size):
+        if index in errors:
+            results.append({"index": index, "error": errors[index]})
+        else:
+            results.append({"index": index, "id": created_ids[index]})
+    return {"created": len(created_ids), "failed": len(errors), "results": results}
 
-from ..models.models import Program, Client, Enrollment, Gender
-from ..models.schemas import ProgramCreate, ClientCreate, ProgramEnrollment, EnrollmentCreate, ClientProfile, GenderEnum
 
 class ProgramService:
     @staticmethod
@@ -16,16 +158,86 @@ class ProgramService:
             db.add(db_program)
             db.commit()
             db.refresh(db_program)
+            get_program_catalog().invalidate()
             return db_program
         except IntegrityError:
             db.rollback()
             raise ValueError(f"Program with name '{program.name}' already exists")
     
+    @staticmethod
+    def insert_programs(db: Session, programs):
+        """Insert validated programs with multi-row inserts, skipping names that already exist (no commit)
+        
+        Returns the created IDs and the per-row errors, both keyed by row index.
+        """
+        if not programs:
+            return {}, {}
+        names = {program.name for _, program in programs}
+        taken = set(db.scalars(select(Program.name).where(Program.name.in_(names))))
+        
+        rows, errors = [], {}
+        for index, program in programs:
+            if program.name in taken:
+                errors[index] = f"Program with name '{program.name}' already exists"
+            else:
+                taken.add(program.name)
+                rows.append((index, {"name": program.name, "description": program.description}))
+        
+        # Names are unique, so they identify each row
+        ids = insert_returning_ids(db, Program, [row for _, row in rows], ["name"]) if rows else []
+        return {index: program_id for (index, _), program_id in zip(rows, ids)}, errors
+    
     @staticmethod
     def get_programs(db: Session, skip: int = 0, limit: int = 100):
         """Get all health programs"""
         return db.query(Program).offset(skip).limit(limit).all()
     
+    @staticmethod
+    def get_programs_page(db: Session, cursor: str = None, limit: int = 100):
+        """Get a page of health programs ordered by (name, id), starting after the cursor"""
+        query = db.query(Program)
+        last_key = decode_cursor(cursor, str, int)
+        if last_key:
+            query = query.filter(tuple_(Program.name, Program.id) > tuple_(*last_key))
+        
+        programs = query.order_by(Program.name, Program.id).limit(limit + 1).all()
+        next_cursor = None
+        if len(programs) > limit:
+            programs = programs[:limit]
+            next_cursor = encode_cursor(programs[-1].name, programs[-1].id)
+        return {"items": programs, "next_cursor": next_cursor}
+    
+    @staticmethod
+    def get_program_clients_page(db: Session, program_id: int, cursor: str = None, limit: int = 100):
+        """Get a page of the clients enrolled in a program ordered by client id, starting after the cursor"""
+        ProgramService.verify_program_exists(db, program_id)
+        query = select(Client, Enrollment.enrollment_date).join(
+            Enrollment, Enrollment.client_id == Client.id
+        ).where(Enrollment.program_id == program_id)
+        last_key = decode_cursor(cursor, int)
+        if last_key:
+            query = query.where(Enrollment.client_id > last_key[0])
+        
+        # Served by the (program_id, client_id) index in key order
+        rows = db.execute(query.order_by(Enrollment.client_id).limit(limit + 1)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].Client.id)
+        
+        items = [
+            {
+                "id": client.id,
+                "name": client.name,
+                "date_of_birth": client.date_of_birth,
+                "contact_info": client.contact_info,
+                "gender": client.gender.value if client.gender else None,
+                "enrollment_date": enrollment_date
+            }
+            for client, enrollment_date in rows
+        ]
+        return {"items": items, "next_cursor": next_cursor}
+    
     @staticmethod
     def get_program_by_id(db: Session, program_id: int):
         """Get a program by ID"""
@@ -33,17 +245,20 @@ class ProgramService:
     
     @staticmethod
     def verify_program_exists(db: Session, program_id: int):
-        """Verify that a program exists and return it or raise a ValueError"""
-        program = ProgramService.get_program_by_id(db, program_id)
-        if not program:
+        """Verify that a program exists and return its name or raise a ValueError
+        
+        Resolved from the program catalog, so no query is issued for known programs.
+        """
+        name = get_program_catalog().get_name(db, program_id)
+        if name is None:
             raise ValueError(f"Program with ID {program_id} not found")
-        return program
+        return name
 
 
 class ClientService:
     @staticmethod
-    def create_client(db: Session, client: ClientCreate):
-        """Register a new client"""
+    def create_client(db: Session, client: ClientCreate, commit: bool = True):
+        """Register a new client; with commit=False it is only flushed, for the caller to commit"""
         # Convert string gender value to enum
         gender_val = None
         if client.gender:
@@ -61,61 +276,174 @@ class ClientService:
             gender=gender_val
         )
         db.add(db_client)
-        db.commit()
-        db.refresh(db_client)
+        if commit:
+            db.commit()
+            db.refresh(db_client)
+        else:
+            db.flush()
+        get_profile_cache().delete(db_client.id)
         return db_client
     
+    @staticmethod
+    def _to_gender(gender):
+        """Helper method to convert a schema gender value to the model enum"""
+        if not gender:
+            return None
+        return Gender(gender.value if isinstance(gender, GenderEnum) else gender)
+    
+    @staticmethod
+    def insert_clients(db: Session, clients):
+        """Insert validated clients with multi-row inserts and return their IDs (no commit)"""
+        if not clients:
+            return []
+        rows = [
+            {
+                "name": client.name,
+                "date_of_birth": client.date_of_birth,
+                "contact_info": client.contact_info,
+                "gender": ClientService._to_gender(client.gender)
+            }
+            for client in clients
+        ]
+        return insert_returning_ids(db, Client, rows, ["name", "date_of_birth", "contact_info", "gender"])
+    
+    @staticmethod
+    def bulk_create_clients(db: Session, records):
+        """Register many clients in one transaction, reporting validation errors per row"""
+        _check_bulk_size(records)
+        valid, errors = validate_records(ClientCreate, records)
+        ids = ClientService.insert_clients(db, [client for _, client in valid])
+        db.commit()
+        for client_id in ids:
+            get_profile_cache().delete(client_id)
+        
+        created_ids = {index: client_id for (index, _), client_id in zip(valid, ids)}
+        return _bulk_result(len(records), created_ids, errors)
+    
     @staticmethod
     def _get_client_enrollments(db: Session, client_id: int):
-        """Helper method to get enrollments for a client"""
-        return db.query(
+        """Helper method to get a client's enrollments as ProgramEnrollment-shaped dictionaries
+        
+        Program names come from the program catalog rather than a join.
+        """
+        rows = db.query(
             Enrollment.program_id,
-            Program.name.label("program_name"),
             Enrollment.enrollment_date
-        ).join(
-            Program, Enrollment.program_id == Program.id
         ).filter(
             Enrollment.client_id == client_id
         ).all()
+        program_names = get_program_catalog().names(db, {row.program_id for row in rows})
+        return ClientService._create_program_enrollments(rows, program_names)
     
     @staticmethod
-    def _create_program_enrollments(enrollments):
-        """Helper method to create program enrollment objects"""
+    def _create_program_enrollments(enrollments, program_names):
+        """Helper method to convert enrollment rows to ProgramEnrollment-shaped dictionaries"""
         return [
-            ProgramEnrollment(
-                program_id=enrollment.program_id,
-                program_name=enrollment.program_name,
-                enrollment_date=enrollment.enrollment_date
-            )
+            {
+                "program_id": enrollment.program_id,
+                "program_name": program_names[enrollment.program_id],
+                "enrollment_date": enrollment.enrollment_date
+            }
             for enrollment in enrollments
         ]
     
     @staticmethod
     def _client_to_dict(client, enrollments):
-        """Helper method to convert client and enrollments to a dictionary"""
+        """Helper method to convert client and enrollments to a dictionary
+        
+        Keys follow the field order of the ClientWithEnrollments/ClientProfile schemas,
+        so the dictionary can be serialized directly (see serialization.py).
+        """
         client_data = {
-            "id": client.id,
             "name": client.name, 
             "date_of_birth": client.date_of_birth,
             "contact_info": client.contact_info,
             "gender": client.gender.value if client.gender else None,
+            "id": client.id,
             "enrollments": enrollments
         }
         return client_data
     
     @staticmethod
-    def _process_clients_with_enrollments(db: Session, clients):
-        """Helper method to process clients and add their enrollments"""
+    def _client_to_sparse_dict(client, enrollments, fields):
+        """Helper method to convert a client row to a dictionary of the selected fields only"""
+        client_data = {}
+        for field in fields:
+            if field == "enrollments":
+                client_data[field] = enrollments
+            elif field == "gender":
+                client_data[field] = client.gender.value if client.gender else None
+            else:
+                client_data[field] = getattr(client, field)
+        return client_data
+    
+    @staticmethod
+    def _select_client_fields(query, fields):
+        """Narrow a client query to the columns a sparse fieldset needs
+        
+        The ID and update time are always kept, for ETags and keyset cursors.
+        """
+        if fields is None:
+            return query
+        columns = [getattr(Client, field) for field in fields if field not in ("id", "enrollments")]
+        return query.with_entities(Client.id, Client.updated_at, *columns)
+    
+    @staticmethod
+    def _get_enrollments_for_clients(db: Session, client_ids):
+        """Helper method to get enrollments for many clients in one query, grouped by client ID
+        
+        Enrollments are ProgramEnrollment-shaped dictionaries named from the program catalog.
+        """
+        grouped = {client_id: [] for client_id in client_ids}
+        if not grouped:
+            return grouped
+        
+        rows = db.query(
+            Enrollment.client_id,
+            Enrollment.program_id,
+            Enrollment.enrollment_date
+        ).filter(
+            Enrollment.client_id.in_(grouped.keys())
+        ).order_by(
+            Enrollment.client_id, Enrollment.id
+        ).all()
+        
+        program_names = get_program_catalog().names(db, {row.program_id for row in rows})
+        for row in rows:
+            grouped[row.client_id].append({
+                "program_id": row.program_id,
+                "program_name": program_names[row.program_id],
+                "enrollment_date": row.enrollment_date
+            })
+        return grouped
+    
+    @staticmethod
+    def _process_clients_with_enrollments(db: Session, clients, fields=None):
+        """Helper method to process clients and add their enrollments
+        
+        With a sparse fieldset only the selected fields are returned, and the
+        enrollment query is skipped unless enrollments are among them.
+        """
+        if fields is not None:
+            enrollments_by_client = {}
+            if "enrollments" in fields:
+                enrollments_by_client = ClientService._get_enrollments_for_clients(
+                    db, [client.id for client in clients]
+                )
+            return [
+                ClientService._client_to_sparse_dict(client, enrollments_by_client.get(client.id, []), fields)
+                for client in clients
+            ]
+        
+        # Load the enrollments for the whole page at once instead of one query per client
+        enrollments_by_client = ClientService._get_enrollments_for_clients(
+            db, [client.id for client in clients]
+        )
+        
         result = []
         for client in clients:
-            # Get enrollments for the client
-            enrollments = ClientService._get_client_enrollments(db, client.id)
-            
-            # Convert to program enrollment objects
-            program_enrollments = ClientService._create_program_enrollments(enrollments)
-            
             # Create client data with enrollments
-            client_data = ClientService._client_to_dict(client, program_enrollments)
+            client_data = ClientService._client_to_dict(client, enrollments_by_client[client.id])
             
             # Add to results
             result.append(client_data)
@@ -123,28 +451,120 @@ class ClientService:
         return result
     
     @staticmethod
-    def get_clients(db: Session, skip: int = 0, limit: int = 100):
-        """Get all clients with their enrollments"""
-        clients = db.query(Client).offset(skip).limit(limit).all()
-        return ClientService._process_clients_with_enrollments(db, clients)
+    def get_clients(db: Session, skip: int = 0, limit: int = 100, not_modified=None, fields=None):
+        """Get all clients with their enrollments
+        
+        not_modified is an optional callable given the page ETag before enrollments are
+        loaded; when it returns True the enrollment load is skipped and None is returned.
+        fields is an optional sparse fieldset from parse_client_fields.
+        """
+        query = ClientService._select_client_fields(db.query(Client), fields)
+        clients = query.offset(skip).limit(limit).all()
+        if not_modified and not_modified(representation_etag(rows_etag(clients), fields)):
+            return None
+        return ClientService._process_clients_with_enrollments(db, clients, fields)
     
     @staticmethod
-    def search_clients(db: Session, search: str, skip: int = 0, limit: int = 100):
-        """Search clients by name or contact info"""
-        clients = db.query(Client).filter(
-            or_(
-                Client.name.ilike(f"%{search}%"),
-                Client.contact_info.ilike(f"%{search}%")
-            )
-        ).offset(skip).limit(limit).all()
+    def search_clients(db: Session, search: str, skip: int = 0, limit: int = 100,
+                       prefix: bool = True, fuzzy: bool = False, not_modified=None, fields=None):
+        """Search clients by name or contact info, best matches first"""
+        query = ClientService._select_client_fields(
+            ClientSearchIndex.query_clients(db, search, prefix=prefix, fuzzy=fuzzy), fields
+        )
+        clients = query.offset(skip).limit(limit).all()
+        if not_modified and not_modified(representation_etag(rows_etag(clients), fields)):
+            return None
+        
+        return ClientService._process_clients_with_enrollments(db, clients, fields)
+    
+    @staticmethod
+    def _get_clients_page(db: Session, query, cursor: str = None, limit: int = 100, not_modified=None, fields=None):
+        """Helper method to fetch a page of clients ordered by id, starting after the cursor"""
+        query = ClientService._select_client_fields(query, fields)
+        last_key = decode_cursor(cursor, int)
+        if last_key:
+            query = query.filter(Client.id > last_key[0])
+        
+        clients = query.order_by(None).order_by(Client.id).limit(limit + 1).all()
+        # The lookahead row is part of the ETag so a page gaining a successor changes it
+        if not_modified and not_modified(representation_etag(rows_etag(clients), fields)):
+            return None
+        next_cursor = None
+        if len(clients) > limit:
+            clients = clients[:limit]
+            next_cursor = encode_cursor(clients[-1].id)
         
-        return ClientService._process_clients_with_enrollments(db, clients)
+        return {
+            "items": ClientService._process_clients_with_enrollments(db, clients, fields),
+            "next_cursor": next_cursor
+        }
+    
+    @staticmethod
+    def get_clients_page(db: Session, cursor: str = None, limit: int = 100, not_modified=None, fields=None):
+        """Get a keyset-paginated page of clients with their enrollments"""
+        return ClientService._get_clients_page(db, db.query(Client), cursor, limit, not_modified, fields)
+    
+    @staticmethod
+    def search_clients_page(db: Session, search: str, cursor: str = None, limit: int = 100,
+                            prefix: bool = True, fuzzy: bool = False, not_modified=None, fields=None):
+        """Search clients with keyset pagination; pages are ordered by id rather than rank"""
+        query = ClientSearchIndex.query_clients(db, search, prefix=prefix, fuzzy=fuzzy)
+        return ClientService._get_clients_page(db, query, cursor, limit, not_modified, fields)
+    
+    @staticmethod
+    def iter_client_batches(db: Session, batch_size: int = EXPORT_BATCH_SIZE):
+        """Yield every client with enrollments in batches, streaming from a server-side cursor"""
+        result = db.execute(
+            select(
+                Client.id, Client.name, Client.date_of_birth, Client.contact_info, Client.gender
+            ).order_by(Client.id).execution_options(yield_per=batch_size)
+        )
+        for clients in result.partitions():
+            enrollments_by_client = ClientService._get_enrollments_for_clients(
+                db, [client.id for client in clients]
+            )
+            yield [
+                ClientService._client_to_dict(client, enrollments_by_client[client.id])
+                for client in clients
+            ]
+    
+    @staticmethod
+    def export_clients_ndjson(db: Session, batch_size: int = EXPORT_BATCH_SIZE):
+        """Stream all clients as newline-delimited JSON, one client per line"""
+        for batch in ClientService.iter_client_batches(db, batch_size):
+            yield "".join(json.dumps(client, default=date.isoformat) + "\n" for client in batch)
+    
+    @staticmethod
+    def export_clients_csv(db: Session, batch_size: int = EXPORT_BATCH_SIZE):
+        """Stream all clients as CSV, one row per enrollment (or one row for clients without any)"""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for batch in ClientService.iter_client_batches(db, batch_size):
+            for client in batch:
+                for enrollment in client["enrollments"] or [{}]:
+                    writer.writerow({**client, **enrollment})
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
     
     @staticmethod
     def get_client_by_id(db: Session, client_id: int):
         """Get a client by ID"""
         return db.query(Client).filter(Client.id == client_id).first()
     
+    @staticmethod
+    def get_client_etag(db: Session, client_id: int):
+        """Get the version tag of a client's profile from its row alone, or None if it does not exist
+        
+        Enrollment changes touch Client.updated_at, so no enrollment join is needed. The
+        response ETag is built from it with representation_etag.
+        """
+        client = db.query(Client.id, Client.updated_at).filter(Client.id == client_id).first()
+        return rows_etag([client]) if client else None
+    
     @staticmethod
     def verify_client_exists(db: Session, client_id: int):
         """Verify that a client exists and return it or raise a ValueError"""
@@ -154,37 +574,104 @@ class ClientService:
         return client
     
     @staticmethod
-    def get_client_profile(db: Session, client_id: int):
-        """Get a client profile with their program enrollments"""
+    def get_client_profile(db: Session, client_id: int, etag: str = None, fields=None):
+        """Get a client profile with their program enrollments, served from the profile cache when possible
+        
+        When the client's current version tag (get_client_etag) is given, a cached profile
+        built for another version is rebuilt.
+        A sparse fieldset is cut from a current cached profile, or else read with a narrowed
+        query (not cached) that joins enrollments only when they are selected.
+        """
+        cache = get_profile_cache()
+        cached = cache.get(client_id)
+        if cached is not None and (etag is None or cached[0] == etag):
+            if fields is not None:
+                return {field: cached[1][field] for field in fields}
+            return cached[1]
+        if fields is not None:
+            return ClientService._build_sparse_client_profile(db, client_id, fields)
+        
+        profile = ClientService._build_client_profile(db, client_id)
+        if profile is not None:
+            cache.set(client_id, (etag, profile))
+        return profile
+    
+    @staticmethod
+    def _build_client_profile(db: Session, client_id: int):
+        """Helper method to build a client profile from the database"""
         db_client = ClientService.get_client_by_id(db, client_id)
         
         if db_client is None:
             return None
             
         # Get enrollments with program information
-        enrollments = ClientService._get_client_enrollments(db, client_id)
-        
-        # Create program enrollments
-        program_enrollments = ClientService._create_program_enrollments(enrollments)
-        
-        # Create the ClientProfile response model
-        return ClientProfile(
-            id=db_client.id,
-            name=db_client.name,
-            date_of_birth=db_client.date_of_birth,
-            contact_info=db_client.contact_info,
-            gender=db_client.gender.value if db_client.gender else None,
-            enrollments=program_enrollments
+        program_enrollments = ClientService._get_client_enrollments(db, client_id)
+        
+        # ClientProfile-shaped dictionary, serialized without another round of validation
+        return ClientService._client_to_dict(db_client, program_enrollments)
+    
+    @staticmethod
+    def get_client_profiles(db: Session, client_ids):
+        """Get the profiles of many clients from two set-based queries, in request order
+        
+        Profiles still current in the profile cache are reused and the rest are built from
+        one enrollment query and cached. Missing IDs are reported inline with an error.
+        """
+        if len(client_ids) > BATCH_PROFILE_MAX_IDS:
+            raise ValueError(f"A batch lookup may contain at most {BATCH_PROFILE_MAX_IDS} client IDs")
+        
+        unique_ids = list(dict.fromkeys(client_ids))
+        clients = db.query(Client).filter(Client.id.in_(unique_ids)).all() if unique_ids else []
+        
+        cache = get_profile_cache()
+        profiles, etags, to_build = {}, {}, []
+        for client in clients:
+            etag = etags[client.id] = rows_etag([client])
+            cached = cache.get(client.id)
+            if cached is not None and cached[0] == etag:
+                profiles[client.id] = cached[1]
+            else:
+                to_build.append(client)
+        
+        enrollments_by_client = ClientService._get_enrollments_for_clients(
+            db, [client.id for client in to_build]
         )
+        for client in to_build:
+            profile = ClientService._client_to_dict(client, enrollments_by_client[client.id])
+            profiles[client.id] = profile
+            cache.set(client.id, (etags[client.id], profile))
+        
+        results = [
+            {"id": client_id, "profile": profiles[client_id], "error": None} if client_id in profiles
+            else {"id": client_id, "profile": None, "error": f"Client with ID {client_id} not found"}
+            for client_id in client_ids
+        ]
+        found = sum(1 for result in results if result["error"] is None)
+        return {"found": found, "missing": len(results) - found, "results": results}
+    
+    @staticmethod
+    def _build_sparse_client_profile(db: Session, client_id: int, fields):
+        """Helper method to read only the selected fields of a client profile"""
+        client = ClientService._select_client_fields(
+            db.query(Client), fields
+        ).filter(Client.id == client_id).first()
+        if client is None:
+            return None
+        
+        enrollments = []
+        if "enrollments" in fields:
+            enrollments = ClientService._get_client_enrollments(db, client_id)
+        return ClientService._client_to_sparse_dict(client, enrollments, fields)
 
 
 class EnrollmentService:
     @staticmethod
-    def enroll_client(db: Session, client_id: int, enrollment: EnrollmentCreate):
-        """Enroll a client in a health program"""
+    def enroll_client(db: Session, client_id: int, enrollment: EnrollmentCreate, commit: bool = True):
+        """Enroll a client in a health program; with commit=False the enrollment is only
+        flushed, for the caller to commit"""
         # Verify client and program exist
         client = ClientService.verify_client_exists(db, client_id)
-        program = ProgramService.verify_program_exists(db, enrollment.program_id)
+        program_name = ProgramService.verify_program_exists(db, enrollment.program_id)
         
         # Create enrollment
         db_enrollment = Enrollment(
@@ -193,22 +680,249 @@ class EnrollmentService:
             enrollment_date=enrollment.enrollment_date if enrollment.enrollment_date else date.today()
         )
         
+        # Enrollment state is part of the client's version (used for ETags)
+        client.updated_at = datetime.utcnow()
+        
         try:
             db.add(db_enrollment)
-            db.commit()
-            db.refresh(db_enrollment)
+            db.flush()
+            EnrollmentStatsService.record(db, [
+                (db_enrollment.program_id, client.gender, client.date_of_birth, db_enrollment.enrollment_date)
+            ])
+            # Built before the commit expires the instance, with the program from the catalog
+            result = EnrollmentService._enrollment_to_dict(db_enrollment, program_name)
+            if commit:
+                db.commit()
             
-            # Ensure the program relationship is loaded
-            db.refresh(db_enrollment.program)
-            
-            return db_enrollment
+            get_profile_cache().delete(client_id)
+            return result
         except IntegrityError:
             db.rollback()
             raise ValueError(f"Client {client_id} is already enrolled in program {enrollment.program_id}")
     
+    @staticmethod
+    def _enrollment_to_dict(enrollment, program_name: str):
+        """Helper method to convert a new enrollment to an Enrollment-shaped dictionary"""
+        return {
+            "program_id": enrollment.program_id,
+            "id": enrollment.id,
+            "client_id": enrollment.client_id,
+            "enrollment_date": enrollment.enrollment_date,
+            "program": {"id": enrollment.program_id, "name": program_name}
+        }
+    
+    @staticmethod
+    def _check_enrollments(db: Session, enrollments):
+        """Helper method to check a batch of enrollments against the database with set-based queries"""
+        client_ids = {enrollment.client_id for _, enrollment in enrollments}
+        program_ids = {enrollment.program_id for _, enrollment in enrollments}
+        
+        existing_clients = {
+            client.id: client
+            for client in db.execute(
+                select(Client.id, Client.gender, Client.date_of_birth).where(Client.id.in_(client_ids))
+            )
+        }
+        existing_programs = get_program_catalog().names(db, program_ids)
+        enrolled = set(db.execute(
+            select(Enrollment.client_id, Enrollment.program_id).where(
+                Enrollment.client_id.in_(client_ids),
+                Enrollment.program_id.in_(program_ids)
+            )
+        ).tuples())
+        
+        rows, errors = [], {}
+        for index, enrollment in enrollments:
+            pair = (enrollment.client_id, enrollment.program_id)
+            if enrollment.client_id not in existing_clients:
+                errors[index] = f"Client with ID {enrollment.client_id} not found"
+            elif enrollment.program_id not in existing_programs:
+                errors[index] = f"Program with ID {enrollment.program_id} not found"
+            elif pair in enrolled:
+                errors[index] = f"Client {pair[0]} is already enrolled in program {pair[1]}"
+            else:
+                # Also catches the same pair appearing twice within the batch
+                enrolled.add(pair)
+                rows.append((index, {
+                    "client_id": enrollment.client_id,
+                    "program_id": enrollment.program_id,
+                    "enrollment_date": enrollment.enrollment_date or date.today()
+                }))
+        return rows, errors, existing_clients
+    
+    @staticmethod
+    def insert_enrollments(db: Session, enrollments):
+        """Check and insert validated enrollments with multi-row inserts (no commit)
+        
+        Returns the created IDs and the per-row errors, both keyed by row index.
+        """
+        if not enrollments:
+            return {}, {}
+        rows, errors, clients = EnrollmentService._check_enrollments(db, enrollments)
+        if not rows:
+            return {}, errors
+        # A client is enrolled in a program at most once, so these identify each row
+        ids = insert_returning_ids(db, Enrollment, [row for _, row in rows], ["client_id", "program_id"])
+        EnrollmentStatsService.record(db, (
+            (row["program_id"], clients[row["client_id"]].gender,
+             clients[row["client_id"]].date_of_birth, row["enrollment_date"])
+            for _, row in rows
+        ))
+        
+        # Enrollment state is part of each client's version (used for ETags)
+        db.execute(
+            update(Client).where(
+                Client.id.in_({row["client_id"] for _, row in rows})
+            ).values(updated_at=datetime.utcnow()).execution_options(synchronize_session=False)
+        )
+        return {index: enrollment_id for (index, _), enrollment_id in zip(rows, ids)}, errors
+    
+    @staticmethod
+    def bulk_enroll_clients(db: Session, records):
+        """Enroll many clients in one transaction, reporting errors per row"""
+        _check_bulk_size(records)
+        valid, errors = validate_records(BulkEnrollmentCreate, records)
+        try:
+            created_ids, row_errors = EnrollmentService.insert_enrollments(db, valid)
+            db.commit()
+        except IntegrityError:
+            # A concurrent writer enrolled one of the pairs after our check; re-check once
+            db.rollback()
+            created_ids, row_errors = EnrollmentService.insert_enrollments(db, valid)
+            db.commit()
+        
+        errors.update(row_errors)
+        for index, enrollment in valid:
+            if index in created_ids:
+                get_profile_cache().delete(enrollment.client_id)
+        return _bulk_result(len(records), created_ids, errors)
+    
     @staticmethod
     def get_client_enrollments(db: Session, client_id: int):
         """Get all enrollments for a client"""
         # Verify client exists
         ClientService.verify_client_exists(db, client_id)
-        return db.query(Enrollment).filter(Enrollment.client_id == client_id).all() 
\ No newline at end of file
+        return db.query(Enrollment).filter(Enrollment.client_id == client_id).all() 
+
+
+class EnrollmentStatsService:
+    @staticmethod
+    def _stats_key(program_id: int, gender, date_of_birth: date, enrollment_date: date):
+        """Helper method to get the aggregate row an enrollment is counted in"""
+        return (
+            program_id,
+            gender.value if gender else UNKNOWN_GENDER,
+            age_band(date_of_birth, enrollment_date),
+            enrollment_date.strftime("%Y-%m")
+        )
+    
+    @staticmethod
+    def record(db: Session, enrollments):
+        """Add enrollments to the pre-aggregated counts with a single upsert (no commit)
+        
+        Takes (program_id, gender, date_of_birth, enrollment_date) tuples.
+        """
+        counts = Counter(EnrollmentStatsService._stats_key(*enrollment) for enrollment in enrollments)
+        if not counts:
+            return
+        table = EnrollmentStat.__table__
+        dialect_insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.program_id, table.c.gender, table.c.age_band, table.c.month],
+            set_={"enrollment_count": table.c.enrollment_count + statement.excluded.enrollment_count}
+        )
+        db.execute(statement, [
+            {"program_id": program_id, "gender": gender, "age_band": band, "month": month, "enrollment_count": count}
+            for (program_id, gender, band, month), count in counts.items()
+        ])
+    
+    @staticmethod
+    def get_stats(db: Session, program_id: int = None, group_by=STATS_DIMENSIONS,
+                  start_month: str = None, end_month: str = None):
+        """Get enrollment counts per program, broken down by the group_by dimensions
+        
+        Reads only the pre-aggregated table, whose size does not grow with the registry.
+        """
+        if program_id is not None:
+            ProgramService.verify_program_exists(db, program_id)
+        dimensions = [getattr(EnrollmentStat, dimension) for dimension in STATS_DIMENSIONS if dimension in group_by]
+        query = select(
+            EnrollmentStat.program_id,
+            Program.name.label("program_name"),
+            *dimensions,
+            func.sum(EnrollmentStat.enrollment_count).label("count")
+        ).join(
+            Program, EnrollmentStat.program_id == Program.id
+        ).group_by(
+            EnrollmentStat.program_id, Program.name, *dimensions
+        ).order_by(
+            Program.name, *dimensions
+        )
+        if program_id is not None:
+            query = query.where(EnrollmentStat.program_id == program_id)
+        if start_month:
+            query = query.where(EnrollmentStat.month >= start_month)
+        if end_month:
+            query = query.where(EnrollmentStat.month <= end_month)
+        
+        rows = [dict(row._mapping) for row in db.execute(query)]
+        return {"total": sum(row["count"] for row in rows), "rows": rows}
+
+
+class ChangeFeedService:
+    # Entities in the feed with the column that orders their changes
+    FEEDS = [
+        ("clients", Client, Client.updated_at),
+        ("programs", Program, Program.updated_at),
+        ("enrollments", Enrollment, Enrollment.created_at),
+    ]
+    
+    @staticmethod
+    def _decode_watermarks(cursor: str, since: datetime):
+        """Helper method to get the (timestamp, id) watermark of each entity from a cursor or a start time"""
+        if cursor:
+            values = decode_cursor(cursor, *[(str, type(None)), int] * len(ChangeFeedService.FEEDS))
+            try:
+                return [
+                    (datetime.fromisoformat(values[i]) if values[i] else None, int(values[i + 1]))
+                    for i in range(0, len(values), 2)
+                ]
+            except (TypeError, ValueError):
+                raise ValueError("Invalid pagination cursor")
+        if since is not None and since.tzinfo is not None:
+            # Timestamps are stored as naive UTC
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return [(since, 0)] * len(ChangeFeedService.FEEDS)
+    
+    @staticmethod
+    def get_changes(db: Session, since: datetime = None, cursor: str = None, limit: int = 100):
+        """Get clients, programs and enrollments changed after a watermark, oldest first
+        
+        Each entity is read in (timestamp, id) order after its own watermark, so the returned
+        cursor resumes every feed exactly where this page stopped.
+        """
+        watermarks = ChangeFeedService._decode_watermarks(cursor, since)
+        settled = datetime.utcnow() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+        
+        result = {"has_more": False}
+        next_watermarks = []
+        for (name, model, changed_at), (last_ts, last_id) in zip(ChangeFeedService.FEEDS, watermarks):
+            query = db.query(model).filter(changed_at <= settled)
+            if last_ts is not None:
+                query = query.filter(or_(
+                    changed_at > last_ts,
+                    and_(changed_at == last_ts, model.id > last_id)
+                ))
+            rows = query.order_by(changed_at, model.id).limit(limit + 1).all()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                result["has_more"] = True
+            if rows:
+                last_ts, last_id = getattr(rows[-1], changed_at.key), rows[-1].id
+            
+            result[name] = rows
+            next_watermarks += [last_ts.isoformat() if last_ts else None, last_id]
+        
+        result["next_cursor"] = encode_cursor(*next_watermarks)
+        return result
@@ -0,0 +1,117 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+
+def seed_database(db_path, rows, programs, seed=42):
+    """Create a database with the given number of clients, each enrolled in one program"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from sqlalchemy import insert
+    from app.database.database import Base, SessionLocal, engine
+    from app.models.models import Client, Enrollment, Program
+
+    rng = random.Random(seed)
+    genders = ["male", "female", "other", None]
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.execute(insert(Program), [{"name": f"Program {i}"} for i in range(programs)])
+    for start in range(0, rows, 50000):
+        batch = range(start, min(start + 50000, rows))
+        db.execute(insert(Client), [
+            {
+                "name": f"Client {i}",
+                "date_of_birth": date(1940, 1, 1) + timedelta(days=rng.randrange(30000)),
+                "gender": rng.choice(genders),
+            }
+            for i in batch
+        ])
+        db.execute(insert(Enrollment), [
+            {
+                "client_id": i + 1,
+                "program_id": 1 + min(int(rng.expovariate(0.5)), programs - 1),
+                "enrollment_date": date(2018, 1, 1) + timedelta(days=rng.randrange(2500)),
+            }
+            for i in batch
+        ])
+        db.commit()
+    db.close()
+
+
+def orm_cohort_report(db, period):
+    """Row-at-a-time equivalent of CohortAnalytics.cohort_report over ORM objects"""
+    from sqlalchemy.orm import joinedload
+    from app.models.models import Enrollment
+    from app.services.services import age_band, UNKNOWN_GENDER
+
+    counts = Counter()
+    enrollments = db.query(Enrollment).options(joinedload(Enrollment.client)).yield_per(10000)
+    for enrollment in enrollments:
+        enrolled = enrollment.enrollment_date
+        if period == "year":
+            bucket = str(enrolled.year)
+        elif period == "quarter":
+            bucket = f"{enrolled.year}-Q{(enrolled.month - 1) // 3 + 1}"
+        else:
+            bucket = f"{enrolled.year}-{enrolled.month:02d}"
+        client = enrollment.client
+        counts[(
+            enrollment.program.name,
+            client.gender.value if client.gender else UNKNOWN_GENDER,
+            age_band(client.date_of_birth, enrolled),
+            bucket,
+        )] += 1
+    return counts
+
+
+def timed(func, repeat):
+    """Best wall-clock time of repeated calls, with the last result"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the vectorized cohort report against the ORM path")
+    parser.add_argument("--rows", type=int, default=1000000, help="Synthetic clients/enrollments (default: 1M)")
+    parser.add_argument("--programs", type=int, default=10)
+    parser.add_argument("--period", choices=["month", "quarter", "year"], default="month")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "analytics.db")
+        print(f"Seeding {args.rows} enrollments...")
+        seed_database(db_path, args.rows, args.programs)
+
+        from app.database.database import SessionLocal
+        from app.services.analytics import CohortAnalytics
+
+        db = SessionLocal()
+        vectorized_time, report = timed(lambda: CohortAnalytics.cohort_report(db, args.period), args.repeat)
+        db.expunge_all()
+        orm_time, orm_counts = timed(lambda: orm_cohort_report(db, args.period), args.repeat)
+        db.close()
+
+        vectorized_counts = Counter({
+            (row["program_name"], row["gender"], row["age_band"], row["period"]): row["count"]
+            for row in report["rows"]
+        })
+        assert vectorized_counts == orm_counts, "Vectorized and ORM reports differ"
+
+        print(f"{len(report['rows'])} groups over {report['total']} enrollments, period={args.period}")
+        print(f"{'path':<11} {'seconds':>8} {'rows/s':>12}")
+        for name, seconds in [("orm", orm_time), ("vectorized", vectorized_time)]:
+            print(f"{name:<11} {seconds:>8.2f} {report['total'] / seconds:>12,.0f}")
+        print(f"speedup    {orm_time / vectorized_time:>8.1f}x")
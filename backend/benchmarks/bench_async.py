@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+
+def seed_database(db_path, clients, programs):
+    """Create a database with the given number of clients, each enrolled in one program"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from app.database.database import Base, SessionLocal, engine
+    from app.models.schemas import ClientCreate, ProgramCreate, BulkEnrollmentCreate
+    from app.services.services import ClientService, ProgramService, EnrollmentService
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    ProgramService.insert_programs(db, [(i, ProgramCreate(name=f"Program {i}")) for i in range(programs)])
+    for start in range(0, clients, 1000):
+        batch = range(start, min(start + 1000, clients))
+        ids = ClientService.insert_clients(db, [
+            ClientCreate(name=f"Client {i}", date_of_birth=date(1950 + i % 60, 1 + i % 12, 1 + i % 28))
+            for i in batch
+        ])
+        EnrollmentService.insert_enrollments(db, [
+            (i, BulkEnrollmentCreate(client_id=client_id, program_id=1 + client_id % programs))
+            for i, client_id in enumerate(ids)
+        ])
+        db.commit()
+    db.close()
+    engine.dispose()
+
+
+async def wait_until_ready(client):
+    for _ in range(100):
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def run_load(base_url, clients, requests, concurrency):
+    """Issue profile reads with bounded concurrency and return per-request latencies and failures"""
+    rng = random.Random(42)
+    client_ids = [rng.randint(1, clients) for _ in range(requests)]
+    latencies = []
+    failures = []
+    queue = asyncio.Queue()
+    for client_id in client_ids:
+        queue.put_nowait(client_id)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        await wait_until_ready(client)
+
+        async def worker():
+            while not queue.empty():
+                client_id = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await client.get(f"/clients/{client_id}")
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    # e.g. a blocked event loop starving the connection pool until it times out
+                    failures.append(client_id)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def benchmark_mode(async_db, db_path, port, args):
+    """Start a single-worker server in the given mode and measure parallel profile reads"""
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        ASYNC_DB="true" if async_db else "false",
+        # Force every read to hit the database
+        PROFILE_CACHE_SIZE="0",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        latencies, failures, elapsed = asyncio.run(
+            run_load(f"http://127.0.0.1:{port}", args.clients, args.requests, args.concurrency)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [float("nan")] * 99
+    return {
+        "mode": "async" if async_db else "sync",
+        "throughput": len(latencies) / elapsed,
+        "failed": len(failures),
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sync and async profile reads under concurrency")
+    parser.add_argument("--clients", type=int, default=20000)
+    parser.add_argument("--programs", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        print(f"Seeding {args.clients} clients...")
+        seed_database(db_path, args.clients, args.programs)
+
+        print(f"{args.requests} profile reads, concurrency {args.concurrency}, one worker")
+        print(f"{'mode':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+        for async_db in (False, True):
+            result = benchmark_mode(async_db, db_path, args.port, args)
+            print(f"{result['mode']:<6} {result['throughput']:>8.0f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['failed']:>7}")
@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.models import Gender
+from app.models.schemas import ClientWithEnrollments
+from app.services.serialization import dumps
+from app.services.services import ClientService
+
+
+def make_rows(count, enrollments, seed=42):
+    """Client and enrollment rows shaped like the ORM results the list endpoints load"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        client = SimpleNamespace(
+            id=i + 1,
+            name=f"Client Wanjirũ {i}",
+            date_of_birth=date(1950, 1, 1) + timedelta(days=rng.randrange(25000)),
+            contact_info=f"Phone: 07{rng.randrange(10 ** 8):08d}",
+            gender=rng.choice([Gender.female, Gender.male, None]),
+        )
+        client_enrollments = [
+            SimpleNamespace(program_id=p + 1, program_name=f"Program {p + 1}",
+                            enrollment_date=date(2020, 1, 1) + timedelta(days=rng.randrange(1500)))
+            for p in range(enrollments)
+        ]
+        rows.append((client, client_enrollments))
+    return rows
+
+
+def pydantic_path(rows, field):
+    """Previous path: ProgramEnrollment models per row, then response_model validation and JSONResponse"""
+    from app.models.schemas import ProgramEnrollment
+    content = []
+    for client, enrollments in rows:
+        data = ClientService._client_to_dict(client, [
+            ProgramEnrollment(program_id=e.program_id, program_name=e.program_name,
+                              enrollment_date=e.enrollment_date)
+            for e in enrollments
+        ])
+        content.append(data)
+    encoded = asyncio.run(serialize_response(field=field, response_content=content))
+    return JSONResponse(encoded).body
+
+
+def direct_path(rows, program_names):
+    """Current path: dictionaries in schema order encoded straight to bytes"""
+    return dumps([
+        ClientService._client_to_dict(client, ClientService._create_program_enrollments(enrollments, program_names))
+        for client, enrollments in rows
+    ])
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-item cost of serializing client list responses")
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--enrollments", type=int, default=2, help="Enrollments per client (default: 2)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    field = create_response_field(name="Response", type_=List[ClientWithEnrollments])
+    print(f"{'items':>7} {'pydantic us/item':>17} {'direct us/item':>15} {'speedup':>8}")
+    for count in args.items:
+        rows = make_rows(count, args.enrollments)
+        before, expected = timed(lambda: pydantic_path(rows, field), args.repeat)
+        program_names = {p + 1: f"Program {p + 1}" for p in range(args.enrollments)}
+        after, body = timed(lambda: direct_path(rows, program_names), args.repeat)
+        assert body == expected, "Direct serialization is not byte-compatible"
+        print(f"{count:>7} {before / count * 1e6:>17.2f} {after / count * 1e6:>15.2f} {before / after:>7.1f}x")
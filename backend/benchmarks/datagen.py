@@ -0,0 +1,141 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.database.database import create_db_engine
+from app.database.migrations import run_migrations
+from app.models.models import Client, Enrollment, Gender, Program
+from app.services.services import EnrollmentStatsService
+
+FIRST_NAMES = [
+    "Amina", "Brian", "Caroline", "David", "Esther", "Felix", "Grace", "Hassan", "Irene", "James",
+    "Joyce", "Kevin", "Lucy", "Mohamed", "Naomi", "Otieno", "Peter", "Rose", "Samuel", "Wanjiru",
+]
+LAST_NAMES = [
+    "Achieng", "Chebet", "Kamau", "Kariuki", "Kiprop", "Mwangi", "Njoroge", "Ochieng", "Odhiambo", "Omondi",
+    "Otieno", "Wafula", "Wambui", "Wanjala", "Njeri", "Mutua", "Kilonzo", "Juma", "Hassan", "Ali",
+]
+PROGRAM_NAMES = [
+    "HIV Care", "TB Treatment", "Malaria Prevention", "Maternal Health", "Child Immunization",
+    "Diabetes Management", "Hypertension Control", "Nutrition Support", "Mental Health", "Family Planning",
+]
+GENDERS = [Gender.female, Gender.male, Gender.other, None]
+GENDER_WEIGHTS = [48, 46, 1, 5]
+
+# Rows written per insert/commit
+CHUNK_SIZE = 10000
+
+# Ages and enrollment dates are relative to this fixed day, so output does not depend on the run date
+AS_OF = date(2025, 1, 1)
+
+
+def program_weights(programs, skew):
+    """Zipf-like popularity: the program of rank r is chosen with weight 1 / r**skew (cumulative)"""
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, programs + 1)))
+
+
+def generate_clients(rng, start, count):
+    """Client rows with realistic names, contact details, genders and ages"""
+    rows = []
+    for i in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        # Ages skew young, as in a typical clinic population
+        age_days = int(min(rng.expovariate(1 / 30), 95) * 365.25) + rng.randrange(365)
+        rows.append({
+            "name": f"{first} {last}",
+            "date_of_birth": AS_OF - timedelta(days=age_days),
+            "contact_info": f"Phone: 07{rng.randrange(10 ** 8):08d}, Email: {first.lower()}.{last.lower()}{i}@example.org",
+            "gender": rng.choices(GENDERS, GENDER_WEIGHTS)[0],
+        })
+    return rows
+
+
+def generate_enrollments(rng, client_rows, programs, weights, max_per_client):
+    """Enrollment rows for (client_id, client row) pairs; most clients join one program, few many"""
+    program_ids = range(1, programs + 1)
+    rows = []
+    for client_id, client in client_rows:
+        wanted = min(1 + int(rng.expovariate(1.5)), max_per_client)
+        chosen = set()
+        while len(chosen) < wanted:
+            chosen.add(rng.choices(program_ids, cum_weights=weights)[0])
+        earliest = max(client["date_of_birth"], AS_OF - timedelta(days=5 * 365))
+        span = max((AS_OF - earliest).days, 1)
+        for program_id in sorted(chosen):
+            rows.append({
+                "client_id": client_id,
+                "program_id": program_id,
+                "enrollment_date": earliest + timedelta(days=rng.randrange(span)),
+            })
+    return rows
+
+
+def generate_registry(db_path, clients, programs=10, seed=42, skew=1.2, max_per_client=4, progress=True):
+    """Create a reproducible synthetic registry database at db_path
+
+    The same arguments always produce the same rows. Enrollment statistics and
+    the search index are maintained as for application writes.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = random.Random(seed)
+    weights = program_weights(programs, skew)
+    engine = create_db_engine(f"sqlite:///{db_path}")
+    run_migrations(engine)
+    started = time.monotonic()
+    with Session(engine) as db:
+        db.execute(insert(Program), [
+            {
+                "name": PROGRAM_NAMES[i] if i < len(PROGRAM_NAMES) else f"Program {i + 1}",
+                "description": "Synthetic benchmark program"
+            }
+            for i in range(programs)
+        ])
+        for start in range(0, clients, CHUNK_SIZE):
+            client_rows = generate_clients(rng, start, min(CHUNK_SIZE, clients - start))
+            # The generator is the only writer, so new rows take the next IDs in order
+            # (cheaper than RETURNING, which is slow for large executemany batches)
+            first_id = (db.scalar(select(func.max(Client.id))) or 0) + 1
+            db.execute(insert(Client), client_rows)
+            ids = range(first_id, first_id + len(client_rows))
+            clients_by_id = dict(zip(ids, client_rows))
+            enrollment_rows = generate_enrollments(rng, zip(ids, client_rows), programs, weights, max_per_client)
+            db.execute(insert(Enrollment), enrollment_rows)
+            EnrollmentStatsService.record(db, (
+                (row["program_id"], clients_by_id[row["client_id"]]["gender"],
+                 clients_by_id[row["client_id"]]["date_of_birth"], row["enrollment_date"])
+                for row in enrollment_rows
+            ))
+            db.commit()
+            if progress:
+                done = start + len(client_rows)
+                print(f"\rGenerated {done}/{clients} clients ({done / max(time.monotonic() - started, 1e-9):,.0f}/s)",
+                      end="", file=sys.stderr, flush=True)
+    if progress:
+        print(file=sys.stderr)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic registry database")
+    parser.add_argument("output", help="SQLite database file to create (replaced if it exists)")
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--programs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skew", type=float, default=1.2, help="Zipf exponent of program popularity (default: 1.2)")
+    parser.add_argument("--max-per-client", type=int, default=4, help="Most programs one client joins (default: 4)")
+    args = parser.parse_args()
+
+    generate_registry(args.output, args.clients, args.programs, args.seed, args.skew, args.max_per_client)
+    print(f"Registry with {args.clients} clients written to {args.output}")
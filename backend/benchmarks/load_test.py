@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from datagen import BACKEND_DIR, generate_registry
+
+API_KEY = os.getenv("API_KEY", "dev_api_key_for_testing")
+SCENARIOS = ["list", "search", "profile", "enroll", "api_profile"]
+
+
+def load_targets(db_path, requests, seed):
+    """Pick request targets from the generated registry: client IDs, search terms and new enrollments"""
+    rng = random.Random(seed)
+    with sqlite3.connect(db_path) as db:
+        client_count = db.execute("SELECT MAX(id) FROM clients").fetchone()[0]
+        program_count = db.execute("SELECT MAX(id) FROM programs").fetchone()[0]
+        names = [row[0] for row in db.execute("SELECT DISTINCT name FROM clients LIMIT 1000")]
+
+        # (client, program) pairs that are not enrolled yet, so every enroll request succeeds
+        new_enrollments = set()
+        while len(new_enrollments) < requests:
+            client_id = rng.randint(1, client_count)
+            program_id = rng.randint(1, program_count)
+            if (client_id, program_id) in new_enrollments:
+                continue
+            enrolled = db.execute(
+                "SELECT 1 FROM enrollments WHERE client_id = ? AND program_id = ?", (client_id, program_id)
+            ).fetchone()
+            if not enrolled:
+                new_enrollments.add((client_id, program_id))
+
+    client_ids = [rng.randint(1, client_count) for _ in range(requests)]
+    # Searches use a word prefix of a real name, e.g. "Wanj"
+    terms = [rng.choice(rng.choice(names).split())[:4] for _ in range(requests)]
+    return {
+        "list": [("GET", f"/clients/?limit=50&skip={rng.randrange(0, 1000)}", None) for _ in range(requests)],
+        "search": [("GET", f"/clients/?search={term}&limit=20", None) for term in terms],
+        "profile": [("GET", f"/clients/{client_id}", None) for client_id in client_ids],
+        "enroll": [
+            ("POST", f"/clients/{client_id}/enrollments/", {"program_id": program_id})
+            for client_id, program_id in sorted(new_enrollments, key=lambda pair: rng.random())
+        ],
+        "api_profile": [("GET", f"/api/clients/{client_id}", None) for client_id in reversed(client_ids)],
+    }
+
+
+async def wait_until_ready(client):
+    for _ in range(300):
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def run_scenario(base_url, requests, concurrency):
+    """Issue requests with bounded concurrency; returns latencies of successes, failure count and elapsed time"""
+    latencies = []
+    failures = 0
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, headers={"X-API-Key": API_KEY},
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        await wait_until_ready(client)
+
+        async def worker():
+            nonlocal failures
+            while not queue.empty():
+                method, path, body = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def summarize(scenario, size, workers, latencies, failures, elapsed):
+    """Latency percentiles (ms) and throughput of one scenario run"""
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [float("nan")] * 99
+    return {
+        "scenario": scenario,
+        "clients": size,
+        "workers": workers,
+        "requests": len(latencies) + failures,
+        "failed": failures,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+    }
+
+
+def benchmark_size(db_path, size, workers, args):
+    """Start the app on a generated registry and run every selected scenario against it"""
+    targets = load_targets(db_path, args.requests, args.seed)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", API_KEY=API_KEY)
+    # Application logs go to a file next to the data so they do not interleave with the report
+    server_log = open(os.path.join(args.data_dir, "server.log"), "a")
+    # The production launcher, so worker count, event loop and HTTP parser match deployments
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--port", str(args.port), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=server_log, stderr=subprocess.STDOUT
+    )
+    results = []
+    try:
+        for scenario in args.scenarios:
+            latencies, failures, elapsed = asyncio.run(
+                run_scenario(f"http://127.0.0.1:{args.port}", targets[scenario], args.concurrency)
+            )
+            result = summarize(scenario, size, workers, latencies, failures, elapsed)
+            results.append(result)
+            print(f"{size:>9} {workers:>7} {scenario:<12} {result['throughput_rps']:>8.0f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['failed']:>7}")
+    finally:
+        server.terminate()
+        server.wait()
+        server_log.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print p95 changes against a previous results file; returns the regressions beyond tolerance"""
+    with open(baseline_path) as f:
+        baseline = {(r["clients"], r.get("workers", 1), r["scenario"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["clients"], result["workers"], result["scenario"]))
+        if not previous or not previous["p95_ms"]:
+            continue
+        change = result["p95_ms"] / previous["p95_ms"] - 1
+        print(f"{result['clients']:>9} {result['workers']:>7} {result['scenario']:<12} p95 {previous['p95_ms']:>8.1f} -> "
+              f"{result['p95_ms']:>8.1f} ms ({change:+.0%})")
+        if change > tolerance:
+            regressions.append(result)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the API against generated registries of several sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Registry sizes in clients (default: 10000 100000 1000000)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario (default: 1000)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1],
+                        help="Server worker counts to compare, e.g. 1 2 4 to check scaling with cores (default: 1)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-dir", default=str(BACKEND_DIR / "benchmarks" / "data"),
+                        help="Where generated registries are kept and reused between runs")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--output", default="load_test_results.json", help="Results file (JSON)")
+    parser.add_argument("--baseline", help="Previous results file to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="p95 increase over the baseline reported as a regression (default: 0.2)")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    print(f"{'clients':>9} {'workers':>7} {'scenario':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for size in args.sizes:
+        # A pristine copy is kept per size and seed; each run works on a scratch copy,
+        # since the enroll scenario writes to it
+        pristine = os.path.join(args.data_dir, f"registry-{size}-seed{args.seed}.db")
+        if not os.path.exists(pristine):
+            print(f"Generating a registry with {size} clients...", file=sys.stderr)
+            generate_registry(pristine + ".tmp", size, seed=args.seed)
+            os.replace(pristine + ".tmp", pristine)
+        for workers in args.workers:
+            scratch = os.path.join(args.data_dir, "scratch.db")
+            source, target = sqlite3.connect(pristine), sqlite3.connect(scratch)
+            source.backup(target)
+            source.close()
+            target.close()
+            results.extend(benchmark_size(scratch, size, workers, args))
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+            "async_db": os.getenv("ASYNC_DB", "false"), "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} scenario(s) regressed by more than {args.tolerance:.0%} at p95")
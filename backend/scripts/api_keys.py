@@ -0,0 +1,42 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Add the parent directory to path so we can import the app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.database.database import SessionLocal, engine
+from app.database.migrations import run_migrations
+from app.services.auth import ApiKeyService
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Issue, list and revoke partner API keys")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Issue a key for a partner (printed once, only its hash is stored)")
+    create.add_argument("partner", help="Partner name")
+    create.add_argument("--rate-limit", type=int, help="Requests per minute (default: API_RATE_LIMIT_PER_MINUTE)")
+    commands.add_parser("list", help="List issued keys")
+    revoke = commands.add_parser("revoke", help="Deactivate a key")
+    revoke.add_argument("key_id", type=int)
+    args = parser.parse_args()
+
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        if args.command == "create":
+            api_key, record = ApiKeyService.create_key(db, args.partner, args.rate_limit)
+            print(f"Created key {record.id} for {record.partner}: {api_key}")
+            print("Store it now; it cannot be shown again.")
+        elif args.command == "list":
+            for record in ApiKeyService.list_keys(db):
+                status = "active" if record.active else f"revoked {record.revoked_at:%Y-%m-%d %H:%M}"
+                limit = f"{record.rate_limit}/min" if record.rate_limit else "default limit"
+                print(f"{record.id:>5}  {record.key_prefix}...  {record.partner}  {limit}  {status}")
+        else:
+            record = ApiKeyService.revoke_key(db, args.key_id)
+            print(f"Revoked key {record.id} ({record.partner}); cached copies expire within the key cache TTL")
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+    finally:
+        db.close()
@@ -0,0 +1,52 @@
+import argparse
+import csv
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+# Add the parent directory to path so we can import the app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.database.database import SessionLocal
+from app.services.analytics import CohortAnalytics, PERIODS
+
+# Column order of the CSV report
+REPORT_COLUMNS = ["program_id", "program_name", "gender", "age_band", "period", "count"]
+
+
+def write_report(report, output, fmt):
+    """Write a cohort report as CSV rows or a JSON document"""
+    if fmt == "json":
+        json.dump(report, output, indent=2)
+        output.write("\n")
+    else:
+        writer = csv.DictWriter(output, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(report["rows"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrollments per program by gender, age band and period")
+    parser.add_argument("--period", choices=PERIODS, default="month", help="Time bucket (default: month)")
+    parser.add_argument("--program-id", type=int, help="Only report on this program")
+    parser.add_argument("--start", type=date.fromisoformat, help="First enrollment date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last enrollment date to include (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv", help="Output format (default: csv)")
+    parser.add_argument("--output", help="Write the report to this file instead of stdout")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = CohortAnalytics.cohort_report(db, args.period, args.program_id, args.start, args.end)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        db.close()
+
+    if args.output:
+        with open(args.output, "w", newline="") as output:
+            write_report(report, output, args.format)
+        print(f"Report written to {args.output}: {report['total']} enrollments in {len(report['rows'])} rows.")
+    else:
+        write_report(report, sys.stdout, args.format)
@@ -0,0 +1,221 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, insert, select, update
+
+# Add the parent directory to path so we can import the app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.database.database import SessionLocal, engine
+from app.database.migrations import run_migrations
+from app.models.schemas import ClientCreate, ProgramCreate, BulkEnrollmentCreate
+from app.services.services import ClientService, ProgramService, EnrollmentService, validate_records
+
+# Progress of each import, kept in the target database so a chunk and the progress
+# that covers it are committed in one transaction. Kept out of Base.metadata, as the
+# application never reads it.
+checkpoint_metadata = MetaData()
+import_checkpoints = Table(
+    "import_checkpoints", checkpoint_metadata,
+    Column("source", String, primary_key=True),
+    Column("kind", String, primary_key=True),
+    Column("rows", Integer, nullable=False),
+    Column("created", Integer, nullable=False),
+    Column("failed", Integer, nullable=False),
+)
+
+# Schema used to validate each kind of record
+SCHEMAS = {
+    "clients": ClientCreate,
+    "programs": ProgramCreate,
+    "enrollments": BulkEnrollmentCreate,
+}
+
+
+def insert_clients(db, valid):
+    """Insert a validated chunk of clients, returning (created, errors)"""
+    return len(ClientService.insert_clients(db, [client for _, client in valid])), {}
+
+
+def insert_programs(db, valid):
+    """Insert a validated chunk of programs, returning (created, errors)"""
+    created, errors = ProgramService.insert_programs(db, valid)
+    return len(created), errors
+
+
+def insert_enrollments(db, valid):
+    """Insert a validated chunk of enrollments, returning (created, errors)"""
+    created, errors = EnrollmentService.insert_enrollments(db, valid)
+    return len(created), errors
+
+
+INSERTERS = {
+    "clients": insert_clients,
+    "programs": insert_programs,
+    "enrollments": insert_enrollments,
+}
+
+
+class MalformedRecord:
+    """Stands in for an NDJSON line that is not valid JSON; reported as that row's error"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def read_records(path):
+    """Stream records from a CSV or NDJSON file without loading it into memory"""
+    with open(path, newline="", encoding="utf-8") as source:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(source):
+                # Empty CSV cells stand for missing optional values
+                yield {key: (value if value != "" else None) for key, value in row.items()}
+        else:
+            for line_number, line in enumerate(source, 1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield MalformedRecord(f"Line {line_number}: invalid JSON ({e.msg})")
+
+
+def read_chunks(records, chunk_size, start):
+    """Group records into (first row index, records) chunks"""
+    index = start
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield index, chunk
+        index += len(chunk)
+
+
+def validate_chunk(kind, start, records):
+    """Validate one chunk of records (runs in a worker process when --workers > 1)"""
+    valid, errors = validate_records(SCHEMAS[kind], records, start)
+    errors.update(
+        (start + offset, record.error) for offset, record in enumerate(records) if isinstance(record, MalformedRecord)
+    )
+    return len(records), valid, errors
+
+
+def validated_chunks(kind, chunks, workers):
+    """Validate chunks in order, optionally in a process pool with a bounded number in flight"""
+    if workers <= 1:
+        for start, records in chunks:
+            yield validate_chunk(kind, start, records)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start, records in chunks:
+            pending.append(pool.submit(validate_chunk, kind, start, records))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _checkpoint_key(source, kind):
+    return (import_checkpoints.c.source == source) & (import_checkpoints.c.kind == kind)
+
+
+def load_checkpoint(db, source, kind):
+    """Return the progress recorded by an interrupted import of the same file"""
+    row = db.execute(select(import_checkpoints).where(_checkpoint_key(source, kind))).mappings().first()
+    if row is None:
+        return {"source": source, "kind": kind, "rows": 0, "created": 0, "failed": 0}
+    return dict(row)
+
+
+def save_checkpoint(db, checkpoint):
+    """Record the progress of the import in the current transaction, to commit with its chunk"""
+    progress = {column: checkpoint[column] for column in ("rows", "created", "failed")}
+    key = _checkpoint_key(checkpoint["source"], checkpoint["kind"])
+    if db.execute(update(import_checkpoints).where(key).values(**progress)).rowcount == 0:
+        db.execute(insert(import_checkpoints).values(**checkpoint))
+
+
+def clear_checkpoint(db, source, kind):
+    """Forget the progress of a finished import"""
+    db.execute(delete(import_checkpoints).where(_checkpoint_key(source, kind)))
+    db.commit()
+
+
+def import_data(kind, path, chunk_size=1000, workers=1, errors_path=None):
+    """Stream a CSV/NDJSON file into the database in validated, chunked bulk inserts
+
+    Each chunk is committed together with the import's progress (in the
+    import_checkpoints table), so an interrupted import resumes after the last
+    committed chunk when run again, without inserting any row twice.
+    """
+    source = os.path.abspath(path)
+    # Also brings an older database up to date, e.g. the search index the clients go into
+    run_migrations(engine)
+    checkpoint_metadata.create_all(bind=engine)
+
+    errors_file = open(errors_path, "a") if errors_path else None
+    db = SessionLocal()
+    started = time.monotonic()
+    imported = 0
+    try:
+        checkpoint = load_checkpoint(db, source, kind)
+        if checkpoint["rows"]:
+            print(f"Resuming {kind} import after row {checkpoint['rows']}")
+
+        records = read_records(source)
+        # Skip rows committed by a previous run
+        for _ in islice(records, checkpoint["rows"]):
+            pass
+
+        chunks = read_chunks(records, chunk_size, checkpoint["rows"])
+        for size, valid, errors in validated_chunks(kind, chunks, workers):
+            created, insert_errors = INSERTERS[kind](db, valid)
+            errors.update(insert_errors)
+
+            checkpoint["rows"] += size
+            checkpoint["created"] += created
+            checkpoint["failed"] += len(errors)
+            save_checkpoint(db, checkpoint)
+            db.commit()
+
+            if errors_file:
+                for index, error in sorted(errors.items()):
+                    errors_file.write(json.dumps({"row": index, "error": error}) + "\n")
+
+            imported += size
+            rate = imported / max(time.monotonic() - started, 1e-9)
+            print(
+                f"\r{kind}: {checkpoint['rows']} rows ({checkpoint['created']} created, "
+                f"{checkpoint['failed']} failed) {rate:,.0f} rows/s",
+                end="", file=sys.stderr, flush=True
+            )
+        clear_checkpoint(db, source, kind)
+    finally:
+        db.close()
+        if errors_file:
+            errors_file.close()
+
+    print(file=sys.stderr)
+    print(f"Import completed: {checkpoint['created']} {kind} created, {checkpoint['failed']} rows failed.")
+    return checkpoint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import clients, programs or enrollments from CSV/NDJSON")
+    parser.add_argument("kind", choices=sorted(SCHEMAS), help="Type of records in the file")
+    parser.add_argument("path", help="CSV (.csv) or NDJSON file to import")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per insert/commit (default: 1000)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to validate rows (default: 1)")
+    parser.add_argument("--errors", help="Append rejected rows to this NDJSON file")
+    args = parser.parse_args()
+
+    import_data(args.kind, args.path, args.chunk_size, args.workers, args.errors)
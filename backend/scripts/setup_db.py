@@ -7,7 +7,8 @@ import sqlite3
 sys.path.append(str(Path(__file__).parent.parent))
 
 from sqlalchemy import create_engine
-from app.database.database import Base, engine
+from app.database.database import engine
+from app.database.migrations import run_migrations
 
 def setup_db():
     """Create a fresh database with all tables"""
@@ -21,8 +22,8 @@ def setup_db():
     
     # Create tables
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Database setup completed successfully.")
+    version = run_migrations(engine)
+    print(f"Database setup completed successfully (schema version {version}).")
 
 if __name__ == "__main__":
     setup_db() 
\ No newline at end of file
@@ -0,0 +1,59 @@
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to path so we can import the app modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.engine import make_url
+
+
+def sqlite_path(url: str) -> str:
+    """File path of a sqlite:/// URL"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or not parsed.database or parsed.database == ":memory:":
+        raise ValueError(f"Not a file-backed SQLite URL: {url}")
+    return parsed.database
+
+
+def sync_replica(primary_path: str, replica_path: str):
+    """Copy the primary database into a replica file as one consistent snapshot
+
+    Uses SQLite's online backup, so the primary stays writable and readers of the
+    replica see either the previous or the new snapshot, never a partial copy.
+    """
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Keep SQLite read replicas in sync with the primary database (local stand-in for replication)")
+    parser.add_argument("replicas", nargs="*",
+                        help="Replica database URLs (default: READ_DATABASE_URLS)")
+    parser.add_argument("--interval", type=float,
+                        help="Repeat every this many seconds instead of syncing once")
+    args = parser.parse_args()
+
+    from app.database.database import DATABASE_URL, READ_DATABASE_URLS
+
+    primary = sqlite_path(DATABASE_URL)
+    replicas = [sqlite_path(url) for url in (args.replicas or READ_DATABASE_URLS)]
+    if not replicas:
+        parser.error("no replicas given and READ_DATABASE_URLS is not set")
+
+    while True:
+        started = time.perf_counter()
+        for replica in replicas:
+            sync_replica(primary, replica)
+        print(f"Synced {len(replicas)} replica(s) from {primary} in {time.perf_counter() - started:.3f}s")
+        if args.interval is None:
+            break
+        time.sleep(args.interval)
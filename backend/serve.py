@@ -0,0 +1,75 @@
+import argparse
+import importlib.util
+import os
+import sys
+
+import uvicorn
+
+# Add the current directory to the Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+
+def default_workers():
+    """One worker per CPU unless WEB_CONCURRENCY says otherwise"""
+    return int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def event_loop():
+    """uvloop when installed, else the standard asyncio loop"""
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol():
+    """httptools' C parser when installed, else the pure-Python h11"""
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def prepare_database():
+    """Bring the schema up to date once, before any worker starts"""
+    from app.database.database import engine
+    from app.database.migrations import run_migrations
+
+    version = run_migrations(engine)
+    # Workers open their own pools; no connection is shared with them
+    engine.dispose()
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the BHIS API with multiple worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="Worker processes (default: WEB_CONCURRENCY or the CPU count)")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds in-flight requests get to finish on shutdown (default: 30)")
+    parser.add_argument("--keep-alive", type=int, default=5, help="Idle keep-alive timeout in seconds (default: 5)")
+    parser.add_argument("--backlog", type=int, default=2048, help="Pending connections queued by the OS")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", action="store_true", help="Skip per-request access log lines")
+    args = parser.parse_args()
+
+    version = prepare_database()
+    # Workers import the app afresh; they skip the schema setup done above
+    os.environ["SCHEMA_SETUP"] = "false"
+
+    loop, http = event_loop(), http_protocol()
+    print(f"Starting BHIS (schema version {version}) on {args.host}:{args.port} "
+          f"with {args.workers} worker(s), {loop} loop, {http} parser")
+    # On SIGTERM/SIGINT each worker stops accepting connections, lets in-flight
+    # requests finish (up to the graceful timeout), then closes its pools
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        proxy_headers=True,
+        log_level=args.log_level,
+        access_log=not args.no_access_log,
+    )
@@ -1,10 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 import sys
 import os
+from contextlib import nullcontext
 from datetime import date
 
 # Add the parent directory to the path so we can import from backend
@@ -12,8 +13,12 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 # Import the FastAPI app and database models
 from backend.app.main import app
-from backend.app.database.database import Base, get_db
+from backend.app.database.database import Base, get_db, get_read_db, get_read_sessionmaker, get_write_db, apply_sqlite_pragmas
 from backend.app.models.models import Program, Client, Enrollment
+from backend.app.services.cache import get_profile_cache
+from backend.app.services.catalog import get_program_catalog
+from backend.app.services.auth import invalidate_api_keys
+from backend.app.services.rate_limit import get_rate_limiter
 
 # Configure test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -24,6 +29,8 @@ engine = create_engine(
     connect_args={"check_same_thread": False},  # Required for SQLite
     poolclass=StaticPool,  # Use StaticPool for in-memory testing
 )
+# Same connection settings as the application engine (e.g. foreign key enforcement)
+event.listen(engine, "connect", apply_sqlite_pragmas)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 @pytest.fixture(scope="session", autouse=True)
@@ -33,6 +40,15 @@ def setup_database():
     yield
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(scope="function", autouse=True)
+def clear_caches():
+    """Empty in-process caches so entries from rolled-back tests are never served"""
+    get_profile_cache().clear()
+    get_program_catalog().invalidate()
+    invalidate_api_keys()
+    get_rate_limiter().clear()
+    yield
+
 @pytest.fixture(scope="function")
 def db_session():
     """Provide a test database session that rolls back changes after each test"""
@@ -46,16 +62,20 @@ def db_session():
 
 @pytest.fixture(scope="function")
 def override_get_db_dependency(db_session: Session):
-    """Override the get_db dependency with our test database session"""
+    """Override the database dependencies (primary and replica sessions) with our test database session"""
     def _override_get_db():
         try:
             yield db_session
         finally:
             pass  # Session managed by fixture
-    app.dependency_overrides[get_db] = _override_get_db
+    for dependency in (get_db, get_read_db, get_write_db):
+        app.dependency_overrides[dependency] = _override_get_db
+    # Streamed responses open sessions from the factory; the test session stays open
+    app.dependency_overrides[get_read_sessionmaker] = lambda: lambda: nullcontext(db_session)
     yield
-    # Clean up override after test
-    del app.dependency_overrides[get_db]
+    # Clean up overrides after test
+    for dependency in (get_db, get_read_db, get_read_sessionmaker, get_write_db):
+        del app.dependency_overrides[dependency]
 
 @pytest.fixture(scope="function")
 def test_client(override_get_db_dependency):
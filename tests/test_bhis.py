@@ -1,3 +1,4 @@
+import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
@@ -135,4 +136,1065 @@ def test_api_authorization(test_client, sample_client):
     if "X-API-Key" in sample_client.id.__dir__():  # Only test if API key auth is implemented
         valid_headers = {"X-API-Key": API_KEY}
         auth_response = test_client.get(f"/api/clients/{sample_client.id}", headers=valid_headers)
-        assert auth_response.status_code == 200 
\ No newline at end of file
+        assert auth_response.status_code == 200 
+# Query Count Tests
+def _count_statements(db_session, func):
+    """Run func and return the number of SQL statements it issued"""
+    from sqlalchemy import event
+    statements = []
+    engine = db_session.get_bind().engine
+    
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    return len(statements)
+
+def test_client_listing_query_count_is_constant(test_client, db_session, sample_program):
+    """Test: Client listing and search load enrollments in one batch, not per client"""
+    from backend.app.models.models import Client, Enrollment
+    
+    for i in range(12):
+        client = Client(name=f"Batch Client {i}", date_of_birth=date(1980, 1, i + 1))
+        db_session.add(client)
+        db_session.flush()
+        db_session.add(Enrollment(client_id=client.id, program_id=sample_program.id))
+    db_session.commit()
+    test_client.get("/clients/?limit=1")  # Loads the program catalog, as at application startup
+    
+    small_page = _count_statements(db_session, lambda: test_client.get("/clients/?limit=2"))
+    large_page = _count_statements(db_session, lambda: test_client.get("/clients/?limit=12"))
+    assert small_page == large_page == 2
+    
+    small_search = _count_statements(db_session, lambda: test_client.get("/clients/?search=Batch&limit=2"))
+    large_search = _count_statements(db_session, lambda: test_client.get("/clients/?search=Batch&limit=12"))
+    assert small_search == large_search
+    
+    response = test_client.get("/clients/?limit=12")
+    assert all(len(c["enrollments"]) == 1 for c in response.json())
+    assert response.json()[0]["enrollments"][0]["program_name"] == sample_program.name
+
+def test_client_search_prefix_and_fuzzy(test_client):
+    """Test: Indexed search supports ranked prefix and typo-tolerant matching"""
+    for name in ["Margaret Otieno", "Martin Kamau", "Grace Wanjiru"]:
+        test_client.post("/clients/", json={"name": name, "date_of_birth": "1990-01-01"})
+    
+    # Prefix matching is on by default
+    results = test_client.get("/clients/?search=Mar").json()
+    assert {c["name"] for c in results} == {"Margaret Otieno", "Martin Kamau"}
+    
+    # Whole-word matching when prefix matching is turned off
+    assert test_client.get("/clients/?search=Mar&prefix=false").json() == []
+    
+    # A misspelled term only matches when fuzzy matching is requested
+    assert test_client.get("/clients/?search=Wanjirru&prefix=false").json() == []
+    results = test_client.get("/clients/?search=Wanjirru&prefix=false&fuzzy=true").json()
+    assert [c["name"] for c in results] == ["Grace Wanjiru"]
+    
+    # Terms also match inside words and numbers, as the substring search before the index did
+    test_client.post("/clients/", json={"name": "John Mwangi", "date_of_birth": "1990-01-01",
+                                        "contact_info": "Phone: 1234567890"})
+    assert [c["name"] for c in test_client.get("/clients/?search=4567").json()] == ["John Mwangi"]
+    assert [c["name"] for c in test_client.get("/clients/?search=oh").json()] == ["John Mwangi"]
+    assert [c["name"] for c in test_client.get("/clients/?search=rgare").json()] == ["Margaret Otieno"]
+    assert [c["name"] for c in test_client.get("/clients/?search=ar tien").json()] == ["Margaret Otieno"]
+    assert test_client.get("/clients/?search=4567&prefix=false").json() == []
+
+# Pagination Tests
+def test_keyset_pagination(test_client):
+    """Test: Cursor pagination walks clients and programs without gaps or repeats"""
+    for i in range(5):
+        test_client.post("/clients/", json={"name": f"Paged Client {i}", "date_of_birth": "1990-01-01"})
+        test_client.post("/programs/", json={"name": f"Program {4 - i}"})
+    
+    seen, cursor = [], ""
+    while cursor is not None:
+        page = test_client.get(f"/clients/?limit=2&cursor={cursor}").json()
+        assert len(page["items"]) <= 2
+        seen += [c["name"] for c in page["items"]]
+        cursor = page["next_cursor"]
+    assert seen == [f"Paged Client {i}" for i in range(5)]
+    
+    page = test_client.get("/clients/?search=Paged&limit=3&cursor=").json()
+    assert len(page["items"]) == 3 and page["next_cursor"]
+    
+    # Programs are keyed on (name, id)
+    first = test_client.get("/programs/?limit=3&cursor=").json()
+    second = test_client.get(f"/programs/?limit=3&cursor={first['next_cursor']}").json()
+    names = [p["name"] for p in first["items"] + second["items"]]
+    assert names == [f"Program {i}" for i in range(5)]
+    assert second["next_cursor"] is None
+    
+    # Offset pagination is unchanged, including large limits
+    assert len(test_client.get("/clients/?skip=1&limit=2").json()) == 2
+    assert len(test_client.get("/clients/?limit=5000").json()) == 5
+    assert test_client.get("/programs/?limit=5000").status_code == 200
+    
+    # Undecodable cursors and cursors with the wrong key types are rejected
+    from backend.app.services.pagination import encode_cursor
+    for cursor in ["not-a-cursor", encode_cursor("a"), encode_cursor(True), encode_cursor(1, 2)]:
+        assert test_client.get(f"/clients/?cursor={cursor}").status_code == 400
+    assert test_client.get(f"/programs/?cursor={encode_cursor(1, 'Program 1')}").status_code == 400
+    assert test_client.get(f"/programs/?cursor={encode_cursor('Program 1', None)}").status_code == 400
+    
+    # Keyset page sizes outside 1..1000 are rejected instead of failing
+    for path in ["/clients/?cursor=&limit=0", "/clients/?cursor=&limit=-1", "/programs/?cursor=&limit=0",
+                 "/clients/?cursor=&limit=1001", "/programs/1/clients?limit=0"]:
+        assert test_client.get(path).status_code == 422
+
+# Bulk Tests
+def test_bulk_client_registration_and_enrollment(test_client, sample_client, sample_program):
+    """Test: Bulk endpoints insert valid rows and report errors per row"""
+    clients = [
+        {"name": "Bulk One", "date_of_birth": "1991-02-03", "gender": "female"},
+        {"name": "Bulk Two"},  # missing date of birth
+        {"name": "Bulk Three", "date_of_birth": "1993-04-05"},
+        5,  # not an object
+    ]
+    response = test_client.post("/clients/bulk", json=clients)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created"] == 2 and result["failed"] == 2
+    assert "date_of_birth" in result["results"][1]["error"]
+    assert result["results"][3]["error"] == "Record must be a JSON object"
+    new_id = result["results"][0]["id"]
+    assert test_client.get(f"/clients/{new_id}").json()["gender"] == "female"
+    
+    enrollments = [
+        {"client_id": new_id, "program_id": sample_program.id},
+        {"client_id": sample_client.id, "program_id": sample_program.id, "enrollment_date": "2023-03-01"},
+        {"client_id": sample_client.id, "program_id": sample_program.id},  # duplicate within the batch
+        {"client_id": new_id, "program_id": 99999},
+        ["not", "an", "object"],
+    ]
+    result = test_client.post("/clients/enrollments/bulk", json=enrollments).json()
+    assert result["created"] == 2 and result["failed"] == 3
+    assert result["results"][4]["error"] == "Record must be a JSON object"
+    assert "already enrolled" in result["results"][2]["error"]
+    assert "not found" in result["results"][3]["error"]
+    
+    # Re-sending a pair that is already stored is reported, not fatal
+    result = test_client.post("/clients/enrollments/bulk", json=enrollments[:1]).json()
+    assert result["created"] == 0 and "already enrolled" in result["results"][0]["error"]
+    
+    profile = test_client.get(f"/clients/{sample_client.id}").json()
+    assert profile["enrollments"][0]["enrollment_date"] == "2023-03-01"
+
+def test_bulk_insert_ids_follow_input_rows(db_session):
+    """Test: Bulk inserts match IDs to rows by value, whatever order RETURNING yields"""
+    from backend.app.models.models import Client
+    from backend.app.models.schemas import ClientCreate
+    from backend.app.services import services
+    
+    class ReversedReturning:
+        """Session wrapper returning multi-row insert results in reverse order"""
+        def __init__(self, db):
+            self.db = db
+        def execute(self, *args, **kwargs):
+            rows = self.db.execute(*args, **kwargs).all()
+            return type("Result", (), {"all": lambda _: rows[::-1]})()
+    
+    clients = [ClientCreate(name=f"Ordered {i}", date_of_birth=date(1990, 1, i + 1)) for i in range(5)]
+    clients.append(clients[0])  # identical rows are interchangeable
+    ids = services.ClientService.insert_clients(ReversedReturning(db_session), clients)
+    names = dict(db_session.query(Client.id, Client.name).filter(Client.id.in_(ids)).all())
+    assert [names[client_id] for client_id in ids] == [client.name for client in clients]
+    assert len(set(ids)) == len(clients)
+
+def test_import_data_reports_invalid_rows(tmp_path):
+    """Test: The import CLI loads valid rows and reports malformed and invalid ones per row"""
+    import json
+    import sqlite3
+    import subprocess
+    import sys
+    from backend.app.database.migrations import MIGRATIONS
+    
+    source = tmp_path / "programs.ndjson"
+    source.write_text("\n".join([
+        '{"name": "Imported A", "description": "first"}',
+        '{"name": "Imported B"',          # malformed JSON
+        '{"description": "no name"}',     # fails validation
+        '',
+        '{"name": "Imported A"}',         # duplicate name
+        '{"name": "Imported C"}',
+    ]) + "\n")
+    errors_path = tmp_path / "rejected.ndjson"
+    script = os.path.join(os.path.dirname(__file__), "..", "backend", "scripts", "import_data.py")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'import.db'}"}
+    result = subprocess.run([sys.executable, script, "programs", str(source), "--chunk-size", "2",
+                             "--errors", str(errors_path)], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "2 programs created, 3 rows failed" in result.stdout
+    
+    errors = {row["row"]: row["error"] for row in map(json.loads, errors_path.read_text().splitlines())}
+    assert errors[1] == "Line 2: invalid JSON (Expecting ',' delimiter)"
+    assert "name" in errors[2]
+    assert "already exists" in errors[3]
+    with sqlite3.connect(tmp_path / "import.db") as connection:
+        names = [row[0] for row in connection.execute("SELECT name FROM programs ORDER BY id")]
+        # The database was brought up to date by the migrations, as at application startup
+        version = connection.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+    assert names == ["Imported A", "Imported C"]
+    assert version == MIGRATIONS[-1][0]
+
+def test_import_data_resumes_from_committed_progress(tmp_path):
+    """Test: An interrupted import resumes after the chunks committed with its progress"""
+    import sqlite3
+    import subprocess
+    import sys
+    
+    source = tmp_path / "clients.ndjson"
+    source.write_text("".join(f'{{"name": "Resumed {i}", "date_of_birth": "1990-01-01"}}\n' for i in range(5)))
+    script = os.path.join(os.path.dirname(__file__), "..", "backend", "scripts", "import_data.py")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'import.db'}"}
+    command = [sys.executable, script, "clients", str(source), "--chunk-size", "2"]
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    
+    # Roll the database back to a crash after the first chunk: its rows and progress committed
+    with sqlite3.connect(tmp_path / "import.db") as connection:
+        assert connection.execute("SELECT COUNT(*) FROM import_checkpoints").fetchone()[0] == 0
+        connection.execute("DELETE FROM clients WHERE name NOT IN ('Resumed 0', 'Resumed 1')")
+        connection.execute("INSERT INTO import_checkpoints (source, kind, rows, created, failed) "
+                           "VALUES (?, 'clients', 2, 2, 0)", (str(source),))
+    
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "Resuming clients import after row 2" in result.stdout
+    assert "5 clients created, 0 rows failed" in result.stdout
+    with sqlite3.connect(tmp_path / "import.db") as connection:
+        names = [row[0] for row in connection.execute("SELECT name FROM clients ORDER BY id")]
+        assert connection.execute("SELECT COUNT(*) FROM import_checkpoints").fetchone()[0] == 0
+    assert names == [f"Resumed {i}" for i in range(5)]
+
+# Export Tests
+def test_client_export_streams_ndjson_and_csv(test_client, sample_enrollment, sample_program):
+    """Test: Export streams every client with enrollments as NDJSON or CSV"""
+    import csv
+    import json
+    test_client.post("/clients/", json={"name": "No Programs", "date_of_birth": "2001-01-01"})
+    
+    response = test_client.get("/clients/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    clients = [json.loads(line) for line in response.text.splitlines()]
+    assert [c["name"] for c in clients] == ["John Doe", "No Programs"]
+    assert clients[0]["enrollments"] == [
+        {"program_id": sample_program.id, "program_name": "TB Program", "enrollment_date": "2023-01-15"}
+    ]
+    
+    response = test_client.get("/clients/export?format=csv")
+    rows = list(csv.DictReader(response.text.splitlines()))
+    assert [(r["name"], r["program_name"]) for r in rows] == [("John Doe", "TB Program"), ("No Programs", "")]
+    
+    assert test_client.get("/clients/export?format=xml").status_code == 422
+
+def test_client_export_returns_its_connection(tmp_path, monkeypatch):
+    """Test: The export stream closes its own session, returning the connection to the pool"""
+    from sqlalchemy.orm import sessionmaker
+    from backend.app.main import app
+    from backend.app.database import database
+    from backend.app.database.database import Base, create_db_engine
+    from backend.app.models.models import Client
+    
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(bind=engine)
+    sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with sessions() as db:
+        db.add_all([Client(name=f"Exported {i}", date_of_birth=date(1980, 1, 1)) for i in range(3)])
+        db.commit()
+    monkeypatch.setattr(database, "SessionLocal", sessions)
+    try:
+        for export_format in ("ndjson", "csv"):
+            response = TestClient(app).get(f"/clients/export?format={export_format}")
+            assert response.status_code == 200 and "Exported 2" in response.text
+            assert engine.pool.checkedout() == 0
+    finally:
+        engine.dispose()
+
+# Cache Tests
+def test_profile_cache_hits_and_invalidation(test_client, sample_client, sample_program):
+    """Test: Profiles are served from cache and invalidated when the client is enrolled"""
+    headers = {"X-API-Key": API_KEY}
+    stats = lambda: test_client.get("/admin/cache", headers=headers).json()["profile"]
+    before = stats()
+    
+    assert test_client.get(f"/clients/{sample_client.id}").json()["enrollments"] == []
+    assert test_client.get(f"/api/clients/{sample_client.id}", headers=headers).status_code == 200
+    after = stats()
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+    
+    test_client.post(f"/clients/{sample_client.id}/enrollments/", json={"program_id": sample_program.id})
+    profile = test_client.get(f"/clients/{sample_client.id}").json()
+    assert [e["program_id"] for e in profile["enrollments"]] == [sample_program.id]
+    
+    assert test_client.get("/admin/cache").status_code == 403
+
+def test_in_memory_cache_lru_and_ttl():
+    """Test: The in-memory cache evicts least recently used entries and expires old ones"""
+    import time
+    from backend.app.services.cache import InMemoryCache
+    
+    cache = InMemoryCache(maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+    assert cache.get(2) is None and cache.get(1) == "a" and cache.get(3) == "c"
+    assert cache.stats()["evictions"] == 1
+    
+    cache = InMemoryCache(maxsize=2, ttl=0.01)
+    cache.set(1, "a")
+    time.sleep(0.02)
+    assert cache.get(1) is None and cache.stats()["expirations"] == 1
+
+# Conditional GET Tests
+def test_etag_conditional_get(test_client, sample_client, sample_program):
+    """Test: Profile and list responses carry ETags and return 304 when unchanged"""
+    url = f"/clients/{sample_client.id}"
+    first = test_client.get(url)
+    etag = first.headers["etag"]
+    
+    cached = test_client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    api_cached = test_client.get(f"/api/clients/{sample_client.id}", headers={"If-None-Match": etag, "X-API-Key": API_KEY})
+    assert api_cached.status_code == 304
+    
+    list_etag = test_client.get("/clients/").headers["etag"]
+    assert test_client.get("/clients/", headers={"If-None-Match": list_etag}).status_code == 304
+    programs_etag = test_client.get("/programs/").headers["etag"]
+    assert test_client.get("/programs/", headers={"If-None-Match": programs_etag}).status_code == 304
+    
+    # Enrolling the client changes both the profile and the list ETags
+    test_client.post(f"{url}/enrollments/", json={"program_id": sample_program.id})
+    changed = test_client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert len(changed.json()["enrollments"]) == 1
+    assert test_client.get("/clients/", headers={"If-None-Match": list_etag}).status_code == 200
+    
+    assert test_client.get("/clients/99999", headers={"If-None-Match": etag}).status_code == 404
+
+# Change Feed Tests
+def test_change_feed(test_client, sample_client, sample_program, monkeypatch):
+    """Test: The change feed returns changes in order and resumes from its cursor"""
+    from backend.app.services import services
+    monkeypatch.setattr(services, "CHANGE_FEED_SETTLE_SECONDS", 0)
+    headers = {"X-API-Key": API_KEY}
+    
+    feed = test_client.get("/api/changes?limit=1", headers=headers).json()
+    assert [c["id"] for c in feed["clients"]] == [sample_client.id]
+    assert [p["id"] for p in feed["programs"]] == [sample_program.id]
+    assert feed["enrollments"] == [] and feed["has_more"] is False
+    
+    # Nothing new since the cursor
+    cursor = feed["next_cursor"]
+    feed = test_client.get(f"/api/changes?cursor={cursor}", headers=headers).json()
+    assert feed["clients"] == feed["programs"] == feed["enrollments"] == []
+    
+    # An enrollment shows up along with the client it touched
+    test_client.post(f"/clients/{sample_client.id}/enrollments/", json={"program_id": sample_program.id})
+    feed = test_client.get(f"/api/changes?cursor={cursor}", headers=headers).json()
+    assert [c["id"] for c in feed["clients"]] == [sample_client.id]
+    assert [(e["client_id"], e["program_id"]) for e in feed["enrollments"]] == [(sample_client.id, sample_program.id)]
+    assert feed["programs"] == []
+    
+    assert test_client.get("/api/changes?since=2999-01-01T00:00:00Z", headers=headers).json()["clients"] == []
+    assert test_client.get("/api/changes").status_code == 403
+
+# Async Database Tests
+def test_async_routes(tmp_path):
+    """Test: AsyncSession routes serve profiles, lists and writes without the sync Session"""
+    import asyncio
+    from fastapi import FastAPI
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import NullPool
+    from backend.app.database.database import Base, get_async_read_db, get_async_write_db
+    from backend.app.routes import async_routes
+    
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}", poolclass=NullPool)
+    
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    asyncio.run(create_tables())
+    
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+    
+    app = FastAPI()
+    for router in [async_routes.async_program_router, async_routes.async_client_router,
+                   async_routes.async_enrollment_router, async_routes.async_api_router]:
+        app.include_router(router)
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
+    app.dependency_overrides[get_async_write_db] = override_get_async_db
+    
+    with TestClient(app) as client:
+        program = client.post("/programs/", json={"name": "Async Program"}).json()
+        patient = client.post("/clients/", json={"name": "Async Client", "date_of_birth": "1980-02-02"}).json()
+        enrollment = client.post(f"/clients/{patient['id']}/enrollments/", json={"program_id": program["id"]})
+        assert enrollment.status_code == 201
+        assert enrollment.json()["program"]["name"] == "Async Program"
+        assert client.post(f"/clients/{patient['id']}/enrollments/", json={"program_id": program["id"]}).status_code == 400
+        
+        profile = client.get(f"/api/clients/{patient['id']}", headers={"X-API-Key": API_KEY})
+        assert profile.json()["enrollments"][0]["program_name"] == "Async Program"
+        assert client.get(f"/clients/{patient['id']}", headers={"If-None-Match": profile.headers["etag"]}).status_code == 304
+        assert client.get("/clients/404").status_code == 404
+        
+        assert [c["name"] for c in client.get("/clients/?search=async").json()] == ["Async Client"]
+        assert client.get("/programs/?cursor=").json()["items"][0]["name"] == "Async Program"
+        
+        keyed = [client.post("/clients/", json={"name": "Keyed Client", "date_of_birth": "1981-03-03"},
+                             headers={"Idempotency-Key": "async-retry"}) for _ in range(2)]
+        assert keyed[0].json() == keyed[1].json()
+        assert keyed[1].headers["idempotent-replayed"] == "true"
+    
+    asyncio.run(engine.dispose())
+
+def test_async_engine_warm_up(tmp_path, monkeypatch):
+    """Test: The application's async engine starts and warms its pool on file-backed SQLite"""
+    import asyncio
+    from sqlalchemy import text
+    from backend.app.database import database
+    
+    monkeypatch.setattr(database, "ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+    monkeypatch.setattr(database, "async_engine", None)
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    
+    async def warm_up_and_query():
+        await database.warm_up_async_pool()
+        try:
+            assert database.async_engine.pool.size() == database.DB_POOL_SIZE
+            assert database.async_engine.pool.checkedin() == database.DB_POOL_SIZE
+            async with database.get_async_sessionmaker()() as db:
+                assert (await db.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+        finally:
+            await database.dispose_engines()
+    asyncio.run(warm_up_and_query())
+
+def test_sqlite_connection_tuning(tmp_path):
+    """Test: File-backed SQLite connections use WAL, a busy timeout and enforce foreign keys"""
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
+    from backend.app.database.database import Base, create_db_engine, SQLITE_BUSY_TIMEOUT_MS
+    from backend.app.models.models import Program, Client, Enrollment
+    
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    assert engine.pool.size() > 1
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == SQLITE_BUSY_TIMEOUT_MS
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    
+    # ondelete="CASCADE" only takes effect with foreign keys enabled
+    db = sessionmaker(bind=engine)()
+    program = Program(name="Cascade Program")
+    patient = Client(name="Cascade Client", date_of_birth=date(1990, 1, 1))
+    db.add_all([program, patient])
+    db.flush()
+    db.add(Enrollment(client_id=patient.id, program_id=program.id))
+    db.commit()
+    db.execute(text("DELETE FROM programs"))
+    db.commit()
+    assert db.execute(text("SELECT COUNT(*) FROM enrollments")).scalar() == 0
+    db.close()
+    engine.dispose()
+
+def test_schema_migrations(tmp_path):
+    """Test: Migrations add missing indexes to an existing database exactly once"""
+    from sqlalchemy import inspect, text
+    from backend.app.database.database import Base, create_db_engine
+    from backend.app.database.migrations import run_migrations, MIGRATIONS
+    
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(bind=engine)
+    # Simulate a database created before the indexes existed
+    with engine.begin() as connection:
+        for name in ["ix_enrollments_program_id_client_id", "ix_clients_name", "ix_clients_updated_at_id"]:
+            connection.exec_driver_sql(f"DROP INDEX {name}")
+    
+    assert run_migrations(engine) == MIGRATIONS[-1][0]
+    indexes = {index["name"] for table in ["clients", "enrollments"] for index in inspect(engine).get_indexes(table)}
+    assert {"ix_enrollments_program_id_client_id", "ix_clients_name", "ix_clients_updated_at_id"} <= indexes
+    
+    with engine.connect() as connection:
+        plan = connection.execute(text("EXPLAIN QUERY PLAN SELECT client_id FROM enrollments WHERE program_id = 1")).all()
+        assert "ix_enrollments_program_id_client_id" in " ".join(row[-1] for row in plan)
+    
+    # Already applied migrations are not run again
+    assert run_migrations(engine) == MIGRATIONS[-1][0]
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM schema_version")).scalar() == len(MIGRATIONS)
+    engine.dispose()
+
+def test_program_roster_pagination(test_client, db_session, sample_program):
+    """Test: Program roster lists enrolled clients page by page"""
+    from backend.app.models.models import Client, Enrollment
+    clients = [Client(name=f"Roster {i}", date_of_birth=date(1990, 1, 1)) for i in range(5)]
+    db_session.add_all(clients)
+    db_session.flush()
+    db_session.add_all([Enrollment(client_id=c.id, program_id=sample_program.id) for c in clients[:3]])
+    db_session.commit()
+    
+    first = test_client.get(f"/programs/{sample_program.id}/clients?limit=2").json()
+    assert [c["name"] for c in first["items"]] == ["Roster 0", "Roster 1"]
+    assert "enrollment_date" in first["items"][0]
+    second = test_client.get(f"/programs/{sample_program.id}/clients?limit=2&cursor={first['next_cursor']}").json()
+    assert [c["name"] for c in second["items"]] == ["Roster 2"]
+    assert second["next_cursor"] is None
+    assert test_client.get("/programs/9999/clients").status_code == 404
+
+def test_enrollment_stats(test_client, db_session, sample_program):
+    """Test: Enrollment statistics are maintained by single and bulk enrollments and can be rolled up"""
+    from backend.app.models.models import Client
+    clients = [
+        Client(name="Stats A", date_of_birth=date(1990, 6, 1), gender="female"),
+        Client(name="Stats B", date_of_birth=date(1990, 6, 1), gender="female"),
+        Client(name="Stats C", date_of_birth=date(2020, 1, 1)),
+    ]
+    db_session.add_all(clients)
+    db_session.commit()
+    
+    test_client.post(f"/clients/{clients[0].id}/enrollments/",
+                     json={"program_id": sample_program.id, "enrollment_date": "2024-03-10"})
+    test_client.post("/clients/enrollments/bulk", json=[
+        {"client_id": clients[1].id, "program_id": sample_program.id, "enrollment_date": "2024-03-20"},
+        {"client_id": clients[2].id, "program_id": sample_program.id, "enrollment_date": "2024-04-01"},
+    ])
+    
+    stats = test_client.get(f"/programs/stats?program_id={sample_program.id}").json()
+    assert stats["total"] == 3
+    assert {(r["gender"], r["age_band"], r["month"], r["count"]) for r in stats["rows"]} == {
+        ("female", "25-34", "2024-03", 2), ("unknown", "0-4", "2024-04", 1)
+    }
+    by_month = test_client.get(f"/programs/stats?group_by=month&start_month=2024-04").json()
+    assert [(r["program_name"], r["gender"], r["month"], r["count"]) for r in by_month["rows"]] == [
+        ("TB Program", None, "2024-04", 1)
+    ]
+
+def test_cohort_report(test_client, db_session, sample_program):
+    """Test: Vectorized cohort report matches the per-row age band and period rules"""
+    from backend.app.models.models import Client, Enrollment
+    from backend.app.services.services import age_band
+    clients = [
+        Client(name="Cohort A", date_of_birth=date(2000, 3, 15), gender="male"),
+        Client(name="Cohort B", date_of_birth=date(2000, 3, 16), gender="male"),
+        Client(name="Cohort C", date_of_birth=date(1950, 1, 1)),
+    ]
+    db_session.add_all(clients)
+    db_session.flush()
+    # Cohort A turns 25 on the enrollment date, Cohort B a day later
+    db_session.add_all([
+        Enrollment(client_id=clients[0].id, program_id=sample_program.id, enrollment_date=date(2025, 3, 15)),
+        Enrollment(client_id=clients[1].id, program_id=sample_program.id, enrollment_date=date(2025, 3, 15)),
+        Enrollment(client_id=clients[2].id, program_id=sample_program.id, enrollment_date=date(2024, 12, 31)),
+    ])
+    db_session.commit()
+    
+    response = test_client.get("/api/reports/cohorts?period=quarter", headers={"X-API-Key": API_KEY})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["total"] == 3
+    assert [(r["gender"], r["age_band"], r["period"], r["count"]) for r in report["rows"]] == [
+        ("unknown", "65+", "2024-Q4", 1), ("male", "15-24", "2025-Q1", 1), ("male", "25-34", "2025-Q1", 1)
+    ]
+    assert age_band(date(2000, 3, 16), date(2025, 3, 15)) == "15-24"
+    
+    monthly = test_client.get("/api/reports/cohorts?start=2025-01-01", headers={"X-API-Key": API_KEY}).json()
+    assert [(r["period"], r["count"]) for r in monthly["rows"]] == [("2025-03", 1), ("2025-03", 1)]
+    assert test_client.get("/api/reports/cohorts").status_code in (401, 403)
+
+def test_request_metrics(test_client, sample_client, sample_program):
+    """Test: Requests report SQL activity in Server-Timing and Prometheus metrics by route template"""
+    from backend.app.services.metrics import get_metrics_registry
+    get_metrics_registry().clear()
+    
+    response = test_client.get(f"/clients/{sample_client.id}")
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=") and "total;dur=" in timing
+    assert int(timing.split('desc="')[1].split(" ")[0]) >= 1
+    test_client.get("/clients/999999")
+    
+    metrics = test_client.get("/admin/metrics", headers={"X-API-Key": API_KEY})
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'bhis_http_requests_total{method="GET",route="/clients/{client_id}",status="200"} 1' in metrics.text
+    assert 'bhis_http_requests_total{method="GET",route="/clients/{client_id}",status="404"} 1' in metrics.text
+    assert 'bhis_http_request_duration_seconds_count{method="GET",route="/clients/{client_id}"} 2' in metrics.text
+    assert 'bhis_db_statements_per_request_bucket{method="GET",route="/clients/{client_id}",le="+Inf"} 2' in metrics.text
+    
+    # Statements that fail leave no timing state behind on the pooled connection
+    from sqlalchemy import create_engine
+    from sqlalchemy.exc import OperationalError
+    from backend.app.services.metrics import start_request, end_request, install_sql_instrumentation
+    install_sql_instrumentation()
+    engine = create_engine("sqlite://")
+    stats, token = start_request()
+    try:
+        with engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM missing_table")
+            connection.exec_driver_sql("SELECT 1")
+            assert connection.info == {}
+    finally:
+        end_request(token)
+    assert stats.statements == 1
+
+def test_slow_query_log(test_client, tmp_path, monkeypatch):
+    """Test: Slow statements are recorded with parameters and query plans and served to admins"""
+    from sqlalchemy import text
+    from backend.app.database.database import Base, create_db_engine
+    from backend.app.database.slow_queries import get_slow_query_recorder
+    
+    recorder = get_slow_query_recorder()
+    recorder.clear()
+    monkeypatch.setattr(recorder, "threshold_ms", 0)
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT client_id FROM enrollments WHERE program_id = :program_id"), {"program_id": 7})
+        # A failing statement leaves no timing state behind on the pooled connection
+        with pytest.raises(Exception):
+            connection.execute(text("SELECT * FROM missing_table"))
+        assert not any(key.startswith("slow_query") for key in connection.info)
+    engine.dispose()
+    monkeypatch.setattr(recorder, "threshold_ms", 10000)
+    
+    response = test_client.get("/admin/slow-queries", headers={"X-API-Key": API_KEY})
+    assert response.status_code == 200
+    entry = next(e for e in response.json()["entries"] if "WHERE program_id" in e["statement"])
+    assert entry["parameters"] == "(7,)"
+    assert any("ix_enrollments_program_id_client_id" in line for line in entry["plan"])
+    
+    assert test_client.delete("/admin/slow-queries", headers={"X-API-Key": API_KEY}).status_code == 204
+    assert recorder.entries() == []
+    
+    # A negative threshold disables the recorder: it is not installed at all
+    from sqlalchemy import event
+    from backend.app.database.slow_queries import SlowQueryRecorder
+    disabled = SlowQueryRecorder(threshold_ms=-1)
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'quiet.db'}")
+    disabled.install(engine)
+    assert not event.contains(engine, "before_cursor_execute", disabled._before_cursor_execute)
+    engine.dispose()
+
+def test_fast_serialization_is_byte_compatible(test_client, sample_program):
+    """Test: Client lists and profiles are encoded directly, byte-for-byte as the response models would be"""
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from backend.app.models.schemas import ClientProfile, ClientPage
+    
+    client = test_client.post("/clients/", json={
+        "name": "Zoë \"Ngũgĩ\" Wa-Thiong'o",
+        "date_of_birth": "1988-02-29",
+        "contact_info": "Tab\there\nline\u001f\\ 📞 +254",
+        "gender": "female"
+    }).json()
+    test_client.post(f"/clients/{client['id']}/enrollments/",
+                     json={"program_id": sample_program.id, "enrollment_date": "2024-01-31"})
+    
+    def reference(model, body):
+        # What FastAPI's JSONResponse renders for a response_model-validated value
+        return json.dumps(jsonable_encoder(model.model_validate(body)), ensure_ascii=False,
+                          allow_nan=False, separators=(",", ":")).encode("utf-8")
+    
+    profile = test_client.get(f"/clients/{client['id']}")
+    assert profile.headers["content-type"] == "application/json"
+    assert profile.content == reference(ClientProfile, profile.json())
+    assert profile.json()["enrollments"][0]["enrollment_date"] == "2024-01-31"
+    assert test_client.get(f"/clients/{client['id']}",
+                           headers={"If-None-Match": profile.headers["etag"]}).status_code == 304
+    
+    api_profile = test_client.get(f"/api/clients/{client['id']}", headers={"X-API-Key": API_KEY})
+    assert api_profile.content == profile.content
+    
+    page = test_client.get("/clients/?cursor=")
+    assert "etag" in page.headers
+    assert page.content == reference(ClientPage, page.json())
+    listing = test_client.get("/clients/")
+    assert listing.content == json.dumps(
+        [json.loads(reference(ClientProfile, item)) for item in listing.json()],
+        ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def test_compression_and_sparse_fieldsets(test_client, db_session, sample_program):
+    """Test: Large responses are gzip/brotli encoded as negotiated and fields= trims both payload and SQL"""
+    import gzip
+    import brotli
+    from sqlalchemy import event
+    from backend.app.middleware.compression import choose_encoding
+    from backend.app.models.models import Client, Enrollment
+    
+    for i in range(30):
+        client = Client(name=f"Mobile Clinic Client {i}", date_of_birth=date(1990, 1, 1),
+                        contact_info=f"Phone: 0712{i:06d}")
+        db_session.add(client)
+        db_session.flush()
+        db_session.add(Enrollment(client_id=client.id, program_id=sample_program.id))
+    db_session.commit()
+    
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("br;q=0.5, gzip") == "gzip"
+    assert choose_encoding("*;q=0.2, br;q=0") == "gzip"
+    assert choose_encoding("identity") is None
+    
+    plain = test_client.get("/clients/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    for encoding, decompress in [("gzip", gzip.decompress), ("br", brotli.decompress)]:
+        response = test_client.get("/clients/", headers={"Accept-Encoding": encoding})
+        assert response.headers["content-encoding"] == encoding
+        assert "accept-encoding" in response.headers["vary"].lower()
+        assert response.headers["etag"] == plain.headers["etag"]
+        assert int(response.headers["content-length"]) < len(plain.content)
+        assert response.content == plain.content  # decoded by the test client
+        conditional = test_client.get("/clients/", headers={"Accept-Encoding": encoding,
+                                                            "If-None-Match": response.headers["etag"]})
+        assert conditional.status_code == 304
+        assert conditional.headers["etag"] == response.headers["etag"]
+    # A 304 for a response too small to encode keeps the ETag its 200 carried
+    small_etag = test_client.get("/clients/?limit=1", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    small_conditional = test_client.get("/clients/?limit=1", headers={"Accept-Encoding": "gzip",
+                                                                      "If-None-Match": small_etag})
+    assert small_conditional.status_code == 304 and small_conditional.headers["etag"] == small_etag
+    # Small bodies stay uncompressed
+    small = test_client.get("/clients/?limit=1", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    
+    statements = []
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    engine = db_session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        sparse = test_client.get("/clients/?fields=name,id&limit=5")
+        sparse_page = test_client.get("/clients/?fields=id&cursor=&limit=5&search=Mobile")
+        profile = test_client.get(f"/api/clients/{client.id}?fields=id,name", headers={"X-API-Key": API_KEY})
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert sparse.json()[0] == {"name": "Mobile Clinic Client 0", "id": sparse.json()[0]["id"]}
+    assert [list(item) for item in sparse_page.json()["items"]] == [["id"]] * 5
+    assert profile.json() == {"name": "Mobile Clinic Client 29", "id": client.id}
+    assert not any("enrollments" in s or "contact_info" in s for s in statements)
+    
+    with_enrollments = test_client.get(f"/clients/{client.id}?fields=enrollments,gender").json()
+    assert list(with_enrollments) == ["gender", "enrollments"]
+    assert with_enrollments["enrollments"][0]["program_id"] == sample_program.id
+    assert test_client.get("/clients/?fields=id,ssn").status_code == 400
+    
+    # Each fieldset has its own ETag, the same however the fields are listed
+    full = test_client.get(f"/clients/{client.id}")
+    sparse = test_client.get(f"/clients/{client.id}?fields=id,name")
+    reordered = test_client.get(f"/clients/{client.id}?fields=name, id")
+    assert full.headers["etag"].startswith('W/"')
+    assert sparse.headers["etag"] != full.headers["etag"]
+    assert reordered.headers["etag"] == sparse.headers["etag"]
+    assert test_client.get(f"/clients/{client.id}?fields=id,name",
+                           headers={"If-None-Match": full.headers["etag"]}).status_code == 200
+    assert test_client.get(f"/clients/{client.id}",
+                           headers={"If-None-Match": sparse.headers["etag"]}).status_code == 200
+    assert test_client.get(f"/clients/{client.id}?fields=id,name",
+                           headers={"If-None-Match": sparse.headers["etag"]}).status_code == 304
+    sparse_list = test_client.get("/clients/?fields=id&limit=5")
+    assert sparse_list.headers["etag"] != test_client.get("/clients/?limit=5").headers["etag"]
+    assert test_client.get("/clients/?limit=5",
+                           headers={"If-None-Match": sparse_list.headers["etag"]}).status_code == 200
+
+def test_batch_profile_lookup(test_client, db_session, sample_program):
+    """Test: Partner batch lookup returns many profiles from two queries and reports missing IDs inline"""
+    from backend.app.models.models import Client, Enrollment
+    
+    ids = []
+    for i in range(20):
+        client = Client(name=f"Partner Client {i}", date_of_birth=date(1985, 1, i + 1))
+        db_session.add(client)
+        db_session.flush()
+        db_session.add(Enrollment(client_id=client.id, program_id=sample_program.id))
+        ids.append(client.id)
+    db_session.commit()
+    
+    assert test_client.post("/api/clients/batch", json={"ids": ids}).status_code in (401, 403)
+    test_client.get(f"/clients/{ids[0]}")  # Loads the program catalog, as at application startup
+    
+    requested = [ids[3], 999999, ids[0]] + ids[5:]
+    statements = _count_statements(db_session, lambda: test_client.post(
+        "/api/clients/batch", json={"ids": requested}, headers={"X-API-Key": API_KEY}))
+    assert statements == 2
+    
+    response = test_client.post("/api/clients/batch", json={"ids": requested}, headers={"X-API-Key": API_KEY})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["found"], body["missing"]) == (len(requested) - 1, 1)
+    assert [r["id"] for r in body["results"]] == requested
+    assert body["results"][1] == {"id": 999999, "profile": None, "error": "Client with ID 999999 not found"}
+    single = test_client.get(f"/api/clients/{ids[3]}", headers={"X-API-Key": API_KEY}).json()
+    assert body["results"][0]["profile"] == single
+    assert single["enrollments"][0]["program_name"] == sample_program.name
+    
+    too_many = test_client.post("/api/clients/batch", json={"ids": list(range(1001))}, headers={"X-API-Key": API_KEY})
+    assert too_many.status_code == 400
+
+def test_program_catalog(test_client, db_session, sample_client, sample_program, monkeypatch):
+    """Test: Enrollment checks and profiles resolve programs from the versioned catalog without SQL"""
+    from sqlalchemy import event
+    from backend.app.models.models import Program
+    from backend.app.services.catalog import get_program_catalog
+    
+    catalog = get_program_catalog()
+    test_client.get(f"/clients/{sample_client.id}")  # Loads the catalog, as at application startup
+    
+    statements = []
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    engine = db_session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        enrolled = test_client.post(f"/clients/{sample_client.id}/enrollments/", json={"program_id": sample_program.id})
+        profile = test_client.get(f"/clients/{sample_client.id}")
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert enrolled.status_code == 201
+    assert enrolled.json()["program"] == {"id": sample_program.id, "name": sample_program.name}
+    assert profile.json()["enrollments"][0]["program_name"] == sample_program.name
+    assert not any("FROM programs" in statement for statement in statements)
+    
+    # A program written by another worker is picked up on first use
+    other = Program(name="Written Elsewhere")
+    db_session.add(other)
+    db_session.commit()
+    response = test_client.post(f"/clients/{sample_client.id}/enrollments/", json={"program_id": other.id})
+    assert response.json()["program"]["name"] == "Written Elsewhere"
+    assert test_client.post(f"/clients/{sample_client.id}/enrollments/",
+                            json={"program_id": 999999}).status_code == 404
+    
+    # Renames are seen once the check interval has passed and the version stamp changed
+    other.name = "Renamed Elsewhere"
+    db_session.commit()
+    monkeypatch.setattr(catalog, "_check_at", 0.0)
+    assert test_client.get(f"/clients/{sample_client.id}").json()["enrollments"][1]["program_name"] == "Renamed Elsewhere"
+    
+    # Programs created through the API invalidate this worker's catalog
+    loads = catalog.loads
+    program = test_client.post("/programs/", json={"name": "Catalog Program"}).json()
+    response = test_client.post(f"/clients/{sample_client.id}/enrollments/", json={"program_id": program["id"]})
+    assert response.status_code == 201
+    assert catalog.loads == loads + 1
+    stats = test_client.get("/admin/cache", headers={"X-API-Key": API_KEY}).json()["programs"]
+    assert stats["programs"] == 3
+
+def test_read_replica_routing(tmp_path, monkeypatch):
+    """Test: Reads go to a replica and writes to the primary, with the writer reading its own writes"""
+    from sqlalchemy.orm import sessionmaker
+    from backend.app.main import app
+    from backend.app.database import database
+    from backend.app.database.database import Base, create_db_engine
+    from backend.scripts.sync_replica import sync_replica
+    
+    primary_path, replica_path = str(tmp_path / "primary.db"), str(tmp_path / "replica.db")
+    primary = create_db_engine(f"sqlite:///{primary_path}")
+    replica = create_db_engine(f"sqlite:///{replica_path}")
+    Base.metadata.create_all(bind=primary)
+    sync_replica(primary_path, replica_path)
+    replica_sessions = sessionmaker(autocommit=False, autoflush=False, bind=replica)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=primary))
+    monkeypatch.setattr(database, "read_engines", [replica])
+    monkeypatch.setattr(database, "_read_sessionmakers", iter(lambda: replica_sessions, None))
+    try:
+        writer, reader = TestClient(app), TestClient(app)
+        created = writer.post("/clients/", json={"name": "Replica Client", "date_of_birth": "1990-05-01"})
+        assert created.status_code == 201
+        assert database.LAST_WRITE_COOKIE in created.cookies
+        client_id = created.json()["id"]
+        
+        # The writer reads its own write from the primary; other callers read the lagging replica
+        assert writer.get(f"/clients/{client_id}").status_code == 200
+        assert reader.get(f"/clients/{client_id}").status_code == 404
+        assert reader.get("/clients/").json() == []
+        
+        sync_replica(primary_path, replica_path)
+        assert reader.get(f"/clients/{client_id}").json()["name"] == "Replica Client"
+        assert [client["id"] for client in reader.get("/clients/").json()] == [client_id]
+        
+        # Once the delay has passed the writer is back on the replicas
+        monkeypatch.setattr(database, "REPLICA_READ_DELAY_SECONDS", 0)
+        writer.post("/programs/", json={"name": "Replica Program"})
+        assert writer.get("/programs/").json() == []
+    finally:
+        primary.dispose()
+        replica.dispose()
+
+def test_async_read_replica_routing(tmp_path, monkeypatch):
+    """Test: Async reads go to a replica and async writes set the read-your-writes cookie"""
+    import asyncio
+    from fastapi import FastAPI
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from backend.app.database import database
+    from backend.app.database.database import Base, create_db_engine, create_async_db_engine
+    from backend.app.routes import async_routes
+    from backend.scripts.sync_replica import sync_replica
+    
+    primary_path, replica_path = str(tmp_path / "primary.db"), str(tmp_path / "replica.db")
+    setup = create_db_engine(f"sqlite:///{primary_path}")
+    Base.metadata.create_all(bind=setup)
+    setup.dispose()
+    sync_replica(primary_path, replica_path)
+    primary = create_async_db_engine(f"sqlite+aiosqlite:///{primary_path}")
+    replica = create_async_db_engine(f"sqlite+aiosqlite:///{replica_path}")
+    replica_sessions = async_sessionmaker(replica, autoflush=False, expire_on_commit=False)
+    monkeypatch.setattr(database, "AsyncSessionLocal",
+                        async_sessionmaker(primary, autoflush=False, expire_on_commit=False))
+    monkeypatch.setattr(database, "read_engines", [replica.sync_engine])
+    monkeypatch.setattr(database, "_async_read_sessionmakers", iter(lambda: replica_sessions, None))
+    
+    app = FastAPI()
+    for router in [async_routes.async_program_router, async_routes.async_client_router,
+                   async_routes.async_enrollment_router, async_routes.async_api_router]:
+        app.include_router(router)
+    try:
+        writer, reader = TestClient(app), TestClient(app)
+        created = writer.post("/clients/", json={"name": "Async Replica Client", "date_of_birth": "1990-05-01"})
+        assert created.status_code == 201
+        assert database.LAST_WRITE_COOKIE in created.cookies
+        client_id = created.json()["id"]
+        
+        assert writer.get(f"/clients/{client_id}").status_code == 200
+        assert reader.get(f"/clients/{client_id}").status_code == 404
+        assert reader.get(f"/api/clients/{client_id}", headers={"X-API-Key": API_KEY}).status_code == 404
+        assert reader.get("/clients/").json() == []
+        
+        sync_replica(primary_path, replica_path)
+        assert reader.get(f"/clients/{client_id}").json()["name"] == "Async Replica Client"
+        assert [client["id"] for client in reader.get("/clients/").json()] == [client_id]
+    finally:
+        async def dispose():
+            await primary.dispose()
+            await replica.dispose()
+        asyncio.run(dispose())
+
+def test_partner_api_keys(test_client, db_session, sample_client, monkeypatch):
+    """Test: Hashed partner keys are resolved through a cache and rate limited per key"""
+    from sqlalchemy import event
+    from backend.app.models.models import ApiKey
+    from backend.app.services import auth
+    from backend.app.services.auth import ApiKeyService, hash_api_key
+    
+    api_key, record = ApiKeyService.create_key(db_session, "Partner Lab", rate_limit=60)
+    assert db_session.query(ApiKey).filter(ApiKey.key_hash == hash_api_key(api_key)).count() == 1
+    assert api_key not in {record.key_hash, record.key_prefix}
+    monkeypatch.setattr(auth, "API_RATE_LIMIT_BURST", 3)
+    
+    statements = []
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    engine = db_session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        responses = [test_client.get(f"/api/clients/{sample_client.id}", headers={"X-API-Key": api_key})
+                     for _ in range(4)]
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    # Only the first request looks the key up; the burst of 3 is then exhausted
+    assert [response.status_code for response in responses] == [200, 200, 200, 429]
+    assert int(responses[3].headers["Retry-After"]) >= 1
+    assert sum("FROM api_keys" in statement for statement in statements) == 1
+    
+    # The static key is not rate limited; unknown keys are rejected
+    for _ in range(5):
+        assert test_client.get(f"/api/clients/{sample_client.id}", headers={"X-API-Key": API_KEY}).status_code == 200
+    assert test_client.get(f"/api/clients/{sample_client.id}", headers={"X-API-Key": "bhis_unknown"}).status_code == 403
+    
+    # Operational endpoints accept only the static key
+    assert test_client.get("/admin/slow-queries", headers={"X-API-Key": api_key}).status_code == 403
+    assert test_client.delete("/admin/slow-queries", headers={"X-API-Key": api_key}).status_code == 403
+    
+    ApiKeyService.revoke_key(db_session, record.id)
+    assert test_client.get(f"/api/clients/{sample_client.id}", headers={"X-API-Key": api_key}).status_code == 403
+    stats = test_client.get("/admin/cache", headers={"X-API-Key": API_KEY}).json()
+    assert stats["rate_limits"]["limited"] == 1
+    
+    # A key limited below the burst size cannot exceed its own limit back-to-back
+    monkeypatch.setattr(auth, "API_RATE_LIMIT_BURST", 60)
+    slow_key, _ = ApiKeyService.create_key(db_session, "Rural Clinic", rate_limit=2)
+    assert [test_client.get(f"/api/clients/{sample_client.id}", headers={"X-API-Key": slow_key}).status_code
+            for _ in range(3)] == [200, 200, 429]
+
+def test_idempotent_writes(test_client, db_session, sample_client, sample_program):
+    """Test: Retries with an Idempotency-Key replay the stored response without writing again"""
+    import hashlib
+    from datetime import datetime, timedelta
+    from sqlalchemy import event
+    from backend.app.models.models import Client, Enrollment, IdempotencyKey
+    
+    client_data = {"name": "Retried Client", "date_of_birth": "1992-07-07", "gender": "female"}
+    first = test_client.post("/clients/", json=client_data, headers={"Idempotency-Key": "client-1"})
+    assert first.status_code == 201
+    
+    statements = []
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    engine = db_session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        retry = test_client.post("/clients/", json=client_data, headers={"Idempotency-Key": "client-1"})
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert retry.status_code == 201
+    assert retry.content == first.content
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert not any("clients" in statement or "enrollments" in statement for statement in statements)
+    assert db_session.query(Client).filter(Client.name == "Retried Client").count() == 1
+    
+    # A key reused for a different request is rejected
+    changed = test_client.post("/clients/", json={**client_data, "name": "Someone Else"},
+                               headers={"Idempotency-Key": "client-1"})
+    assert changed.status_code == 422
+    
+    # Enrollment retries are replayed instead of failing on the unique constraint
+    path = f"/clients/{sample_client.id}/enrollments/"
+    enrollments = [test_client.post(path, json={"program_id": sample_program.id}, headers={"Idempotency-Key": "enroll-1"})
+                   for _ in range(2)]
+    assert [response.status_code for response in enrollments] == [201, 201]
+    assert enrollments[0].json() == enrollments[1].json()
+    assert db_session.query(Enrollment).filter(Enrollment.client_id == sample_client.id).count() == 1
+    
+    # Expired keys no longer deduplicate
+    db_session.query(IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db_session.commit()
+    again = test_client.post("/clients/", json=client_data, headers={"Idempotency-Key": "client-1"})
+    assert again.status_code == 201
+    assert again.json()["id"] != first.json()["id"]
+    assert "Idempotent-Replayed" not in again.headers
+    
+    # Failed requests release their key, so a retry is processed again
+    failed = test_client.post(path, json={"program_id": 999999}, headers={"Idempotency-Key": "enroll-2"})
+    assert failed.status_code == 404
+    assert db_session.get(IdempotencyKey, hashlib.sha256(b"enroll-2").hexdigest()) is None
+
+def test_idempotent_write_is_atomic_with_its_response(test_client, db_session, monkeypatch):
+    """Test: A write whose response cannot be stored is rolled back, so a retry applies it once"""
+    from backend.app.models.models import Client
+    from backend.app.services.idempotency import IdempotencyService
+    
+    complete = IdempotencyService.complete
+    def failing_complete(db, key, status_code, content):
+        raise RuntimeError("lost connection")
+    monkeypatch.setattr(IdempotencyService, "complete", staticmethod(failing_complete))
+    client_data = {"name": "Atomic Client", "date_of_birth": "1993-03-03"}
+    assert test_client.post("/clients/", json=client_data, headers={"Idempotency-Key": "atomic-1"}).status_code == 500
+    assert db_session.query(Client).filter(Client.name == "Atomic Client").count() == 0
+    
+    # The retry is processed (not refused as still in progress), then replayed
+    monkeypatch.setattr(IdempotencyService, "complete", complete)
+    retries = [test_client.post("/clients/", json=client_data, headers={"Idempotency-Key": "atomic-1"})
+               for _ in range(2)]
+    assert [response.status_code for response in retries] == [201, 201]
+    assert retries[1].headers["Idempotent-Replayed"] == "true"
+    assert db_session.query(Client).filter(Client.name == "Atomic Client").count() == 1